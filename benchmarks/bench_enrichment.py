@@ -0,0 +1,36 @@
+"""
+Benchmarks of the enrichment of the mapped rows : the metadata of the mappings, and the periodization.
+"""
+import pytest
+
+import pyfin.coremodel as c
+from generators import generate_keywords, generate_statement_frame, generate_mapping_frame
+
+
+@pytest.fixture(scope='module')
+def keywords(keyword_count):
+    return generate_keywords(keyword_count)
+
+
+@pytest.fixture(scope='module')
+def mapped(keywords, row_count):
+    df = generate_statement_frame(row_count, keywords)
+    df = c.add_extra_columns(df)
+    return c.map_keywords(df, 'Description', c.KeywordMatcher(keywords))
+
+
+def test_map_extradata(benchmark, keywords, mapped):
+    mappings = generate_mapping_frame(keywords)
+    df = benchmark(c.map_extradata, mapped, 'Keyword', mappings)
+    assert len(df) == len(mapped)
+    assert df['Mois'].notna().all()
+
+
+@pytest.mark.parametrize('share', [0.01, 0.1])
+def test_explode_values(benchmark, row_count, share):
+    df = generate_statement_frame(row_count, generate_keywords(100))
+    df['Mois'] = df['Date']
+    # the rows above the threshold are spread over twelve months
+    threshold = df['Dépense'].quantile(1 - share)
+    result = benchmark(c.explode_values, df, 'Dépense', 'Mois', threshold=threshold)
+    assert len(result) == len(df) + 11 * (df['Dépense'] >= threshold).sum()
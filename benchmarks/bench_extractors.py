@@ -0,0 +1,39 @@
+"""
+Benchmarks of the reading of the downloaded statements, parsed or taken from the statement cache.
+"""
+import datetime as dt
+
+import pytest
+
+from pyfin.extractors import ExtractorCreditAgricole, ExtractorBoursorama
+from pyfin.statementcache import StatementCache
+from generators import write_credit_agricole_statement, write_boursorama_statement
+
+
+@pytest.fixture(scope='module')
+def downloads(tmp_path_factory, statement_rows):
+    folder = tmp_path_factory.mktemp('downloads')
+    write_credit_agricole_statement(folder.joinpath('CA20241231_120000.xlsx'), statement_rows)
+    write_boursorama_statement(folder.joinpath('export-operations-31-12-2024_12-00-00.csv'), statement_rows)
+    return folder
+
+
+@pytest.mark.parametrize('extractor', [ExtractorCreditAgricole, ExtractorBoursorama])
+def test_get_data(benchmark, downloads, statement_rows, extractor):
+    df = benchmark(lambda: extractor(str(downloads), 'Archive').get_data())
+    assert len(df) == statement_rows
+
+
+@pytest.mark.parametrize('extractor', [ExtractorCreditAgricole, ExtractorBoursorama])
+def test_get_data_since(benchmark, downloads, extractor):
+    # the watermark of an account imported a month ago
+    df = benchmark(lambda: extractor(str(downloads), 'Archive').get_data(since=dt.date(2024, 12, 1)))
+    assert (df['Date'] >= dt.date(2024, 12, 1)).all()
+
+
+@pytest.mark.parametrize('extractor', [ExtractorCreditAgricole, ExtractorBoursorama])
+def test_get_data_cached(benchmark, downloads, tmp_path, statement_rows, extractor):
+    cache = StatementCache(tmp_path)
+    extractor(str(downloads), 'Archive', cache=cache).get_data()
+    df = benchmark(lambda: extractor(str(downloads), 'Archive', cache=cache).get_data())
+    assert len(df) == statement_rows
@@ -0,0 +1,51 @@
+"""
+Benchmarks of the matching of the descriptions against the mapping keywords.
+"""
+import pytest
+
+import pyfin.coremodel as c
+from generators import generate_keywords, generate_descriptions, generate_statement_frame, generate_map_categories
+
+
+@pytest.fixture(scope='module')
+def keywords(keyword_count):
+    return generate_keywords(keyword_count)
+
+
+@pytest.fixture(scope='module')
+def descriptions(keywords):
+    return generate_descriptions(1000, keywords)
+
+
+@pytest.fixture(scope='module')
+def statement(keywords, row_count):
+    return generate_statement_frame(row_count, keywords)
+
+
+def test_match_first_keyword(benchmark, keywords, descriptions):
+    # the original linear scan, one description at a time
+    result = benchmark(lambda: [c.match_first_keyword(d, keywords) for d in descriptions])
+    assert len(result) == len(descriptions)
+
+
+def test_keyword_matcher_build(benchmark, keywords):
+    matcher = benchmark(c.KeywordMatcher, keywords)
+    assert len(matcher.keywords) == len(keywords)
+
+
+def test_keyword_matcher(benchmark, keywords, descriptions):
+    matcher = c.KeywordMatcher(keywords)
+    result = benchmark(lambda: [matcher.match(d) for d in descriptions])
+    assert result[:50] == [c.match_first_keyword(d, keywords) for d in descriptions[:50]]
+
+
+def test_map_keywords(benchmark, keywords, statement):
+    matcher = c.KeywordMatcher(keywords)
+    df = benchmark(c.map_keywords, statement.copy(), 'Description', matcher)
+    assert df['Keyword'].notna().mean() > 0.5
+
+
+def test_map_categories(benchmark, keywords, statement):
+    categories = generate_map_categories(keywords)
+    df = benchmark(c.map_categories, statement.copy(), categories)
+    assert (df['Catégorie'] != '').mean() > 0.5
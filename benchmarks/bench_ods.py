@@ -0,0 +1,46 @@
+"""
+Benchmarks of the append of the imported rows to the comptes workbook, streamed or through the DOM.
+"""
+import shutil
+
+import pytest
+
+import pyfin.coremodel as c
+from pyfin.store import store_frame_to_ods
+from pyfin.indexfinder import get_index_from_file, read_comptes_columns
+from generators import write_comptes_workbook, generate_keywords, generate_statement_frame
+
+
+@pytest.fixture(scope='module')
+def workbook(tmp_path_factory, workbook_rows):
+    filepath = tmp_path_factory.mktemp('comptes').joinpath('comptes.ods')
+    write_comptes_workbook(filepath, workbook_rows)
+    return filepath
+
+
+@pytest.fixture(scope='module')
+def imported():
+    df = c.add_extra_columns(generate_statement_frame(200, generate_keywords(100), seed=1))
+    df = c.add_insertdate(df, df['Date'].max())
+    return df
+
+
+@pytest.mark.parametrize('streaming', [True, False])
+def test_store_frame_to_ods(benchmark, workbook, imported, tmp_path, streaming):
+    target = tmp_path.joinpath('comptes.ods')
+
+    # each round appends to a fresh copy of the workbook
+    def setup():
+        shutil.copyfile(workbook, target)
+        return (imported.copy(), target, 'Mouvements'), {'streaming': streaming}
+
+    benchmark.pedantic(store_frame_to_ods, setup=setup, rounds=5)
+
+
+def test_get_index_from_file(benchmark, workbook, workbook_rows):
+    # the cached columns would hide the reading : the cache is cleared at each round
+    def read():
+        read_comptes_columns.cache_clear()
+        return get_index_from_file(workbook)
+
+    assert benchmark(read) == workbook_rows - 1
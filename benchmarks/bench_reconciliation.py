@@ -0,0 +1,51 @@
+"""
+Benchmarks of the mode 7 import : the reconciliation of the imported rows with the pending movements
+of a comptes history kept in SQLite.
+"""
+import datetime as dt
+
+import pytest
+from sqlalchemy import create_engine
+
+from pyfin.database import ReconciliationIndex, get_mouvements_by_account
+from pyfin.store import store_frame_to_sql_mode_7, validate_frame, convert_frame_to_mouvements
+from generators import create_comptes_history, generate_candidates
+
+end_date = dt.date(2024, 12, 31)
+start_date = end_date - dt.timedelta(days=30)
+account = 'Crédit Agricole'
+
+
+@pytest.fixture(scope='module')
+def history(tmp_path_factory, history_size):
+    engine = create_engine('sqlite:///' + str(tmp_path_factory.mktemp('history').joinpath('finance.sqlite')))
+    pending = create_comptes_history(engine, history_size, end_date=end_date)
+    yield engine, pending
+    engine.dispose()
+
+
+@pytest.mark.parametrize('bulk', [True, False])
+def test_store_mode_7(benchmark, history, bulk):
+    engine, pending = history
+    candidates = generate_candidates(pending, 500, account, end_date=end_date)
+
+    # the frame is modified by the import : each round gets its own copy. The simulation leaves the history as is
+    def store(df):
+        store_frame_to_sql_mode_7(df, engine, start_date, end_date, len(pending), simulate=True,
+                                  account_name=account, bulk=bulk)
+
+    benchmark.pedantic(store, setup=lambda: ((candidates.copy(),), {}), rounds=5)
+
+
+def test_reconciliation_index(benchmark, history):
+    engine, pending = history
+    mvt_futurs = get_mouvements_by_account(start_date, end_date, account, e=engine)
+    candidates = convert_frame_to_mouvements(validate_frame(generate_candidates(pending, 500, account)), None)
+
+    def reconcile():
+        index = ReconciliationIndex(mvt_futurs)
+        found = [index.pop_cheque(m) if m.is_cheque() else index.pop_similar(m) for m in candidates]
+        return len([m for m in found if m is not None])
+
+    # half of the pending movements of the account come back from the bank
+    assert benchmark(reconcile) >= len([m for m in pending if m['compte'] == account]) // 2
@@ -0,0 +1,38 @@
+"""
+Configuration of the benchmarks : the sizes of the generated data, and the folder of the stored baselines.
+"""
+from pathlib import Path
+
+import pytest
+
+# the sizes of each scale : the quick one runs in a few minutes, the full one reaches the sizes of a long history
+scales = {'quick': {'keyword_count': [10, 1000],
+                    'row_count': [10000],
+                    'statement_rows': [1000],
+                    'history_size': [10000],
+                    'workbook_rows': [1000]},
+          'full': {'keyword_count': [10, 100, 1000, 10000],
+                   'row_count': [10000, 100000],
+                   'statement_rows': [1000, 10000],
+                   'history_size': [10000, 100000, 1000000],
+                   'workbook_rows': [1000, 10000]}}
+
+baselines_folder = Path(__file__).parent.joinpath('baselines')
+
+
+def pytest_addoption(parser):
+    parser.addoption('--scale', choices=list(scales), default='quick', help='the sizes of the generated data')
+
+
+@pytest.hookimpl(tryfirst=True)
+def pytest_configure(config):
+    # the runs are saved next to the benchmarks, wherever pytest is started from
+    if config.getoption('benchmark_storage') == 'file://./.benchmarks':
+        config.option.benchmark_storage = baselines_folder.as_uri()
+
+
+def pytest_generate_tests(metafunc):
+    # the generated data is shared by the benchmarks of a module
+    for name, sizes in scales[metafunc.config.getoption('scale')].items():
+        if name in metafunc.fixturenames:
+            metafunc.parametrize(name, sizes, scope='module')
@@ -0,0 +1,212 @@
+"""
+Seeded generators of synthetic bank statements, for the benchmarks.
+The same seed and size always give the same data, so that the timings of two runs compare the same work.
+"""
+from pathlib import Path
+import datetime as dt
+
+import numpy as np
+import pandas as pd
+
+syllables = ['ca', 'fou', 'lec', 'lerc', 'tri', 'mar', 'che', 'pha', 'ma', 'cie', 'bou', 'lan', 'ge', 'rie', 'sa',
+             'vo', 'to', 'ta', 'lo', 'yer', 'pre', 'lev', 'vir', 'ban', 'que', 'po', 'ste', 'nu', 'mer', 'ik']
+prefixes = ['PRLV SEPA', 'CARTE X1234', 'VIR SEPA', 'PAIEMENT PAR CARTE', 'RETRAIT DAB']
+categories = ['Courses', 'Maison', 'Transport', 'Santé', 'Loisirs', 'Impôts', 'Salaire', 'Virements']
+accounts = ['Crédit Agricole', 'Boursorama', 'Liquide Vincent', 'Liquide Aurélie']
+
+
+def generate_keywords(count: int, seed: int = 0) -> list:
+    """ Returns distinct merchant-like keywords"""
+    rng = np.random.default_rng(seed)
+    result = {}
+    while len(result) < count:
+        # some keywords contain shorter ones, as in the real mappings
+        result.setdefault(''.join(rng.choice(syllables, size=rng.integers(2, 6))), None)
+    return list(result)
+
+
+def generate_descriptions(count: int, keywords: list, seed: int = 0, match_ratio: float = 0.7) -> list:
+    """ Returns statement descriptions, a share of which contains one of the keywords"""
+    rng = np.random.default_rng(seed)
+    matched = rng.random(count) < match_ratio
+    picked = rng.integers(0, len(keywords), count)
+    words = [''.join(rng.choice(syllables, size=3)) for i in range(64)]
+    prefix = rng.integers(0, len(prefixes), count)
+    noise = rng.integers(0, len(words), count)
+    reference = rng.integers(0, 10 ** 6, count)
+    return [f'{prefixes[prefix[i]]} {keywords[picked[i]] if matched[i] else words[noise[i]]} '
+            f'{reference[i]:06d}' for i in range(count)]
+
+
+def generate_mapping_frame(keywords: list, seed: int = 0) -> pd.DataFrame:
+    """ Returns the active mappings of the keywords, with the columns of the map_categories table"""
+    rng = np.random.default_rng(seed)
+    count = len(keywords)
+    enriched = rng.random(count) < 0.2
+    return pd.DataFrame({'Keyword': keywords,
+                         'Catégorie': rng.choice(categories, size=count),
+                         'déclarant': np.where(enriched, 'Vincent', None),
+                         'organisme': np.where(enriched, 'Mutuelle', None),
+                         'monthshift': np.where(enriched, rng.integers(-1, 2, count), np.nan),
+                         'inactif': False,
+                         'employeur': np.where(rng.random(count) < 0.02, 'Employeur', None)})
+
+
+def generate_map_categories(keywords: list, seed: int = 0) -> list:
+    """ Returns the keywords as MapCategorie objects, the form map_categories receives"""
+    from pyfin.database import MapCategorie
+
+    df = generate_mapping_frame(keywords, seed)
+    return [MapCategorie(keyword=k, categorie=c, inactif=False) for k, c in zip(df['Keyword'], df['Catégorie'])]
+
+
+def generate_statement_frame(count: int, keywords: list, seed: int = 0, end_date: dt.date = dt.date(2024, 12, 31),
+                             days: int = 365, account: str = 'Crédit Agricole') -> pd.DataFrame:
+    """ Returns extracted rows with the columns the pipeline expects, from the newest to the oldest"""
+    rng = np.random.default_rng(seed)
+    offsets = np.sort(rng.integers(0, days, count))
+    dates = [end_date - dt.timedelta(days=int(d)) for d in offsets]
+    amounts = np.round(rng.lognormal(3, 1.2, count), 2)
+    income = rng.random(count) < 0.1
+    cheque = rng.random(count) < 0.02
+    return pd.DataFrame({'Date': dates,
+                         'Index': '',
+                         'Description': generate_descriptions(count, keywords, seed),
+                         'Dépense': np.where(income, np.nan, amounts),
+                         'Numéro de référence': np.where(cheque, rng.integers(10 ** 6, 10 ** 7, count).astype(str), ''),
+                         'Recette': np.where(income, amounts, np.nan),
+                         'Compte': account,
+                         'Catégorie': '',
+                         'excluded': False})
+
+
+def write_credit_agricole_statement(filepath: Path, count: int, seed: int = 0,
+                                    end_date: dt.date = dt.date(2024, 12, 31)):
+    """ Writes an xlsx statement laid out as the Crédit Agricole downloads : a preamble, then the header row"""
+    import openpyxl
+
+    df = generate_statement_frame(count, generate_keywords(200, seed), seed, end_date)
+    book = openpyxl.Workbook(write_only=True)
+    sheet = book.create_sheet('Compte de dépôt')
+    sheet.append(['Compte de dépôt carte n°XXXX', None, None, None])
+    sheet.append([f'Liste des opérations au {end_date:%d/%m/%Y}', None, None, None])
+    sheet.append(['Solde au', None, None, 1000.0])
+    sheet.append(['Date', 'Libellé', 'Débit euros', 'Crédit euros'])
+    for d, description, depense, recette in zip(df['Date'], df['Description'], df['Dépense'], df['Recette']):
+        # the downloaded descriptions span several lines
+        sheet.append([dt.datetime.combine(d, dt.time()), description.replace(' ', '\n  ', 1),
+                      None if np.isnan(depense) else depense, None if np.isnan(recette) else recette])
+    book.save(filepath)
+
+
+def write_boursorama_statement(filepath: Path, count: int, seed: int = 0,
+                               end_date: dt.date = dt.date(2024, 12, 31)):
+    """ Writes a csv statement laid out as the Boursorama exports"""
+    df = generate_statement_frame(count, generate_keywords(200, seed), seed, end_date, account='Boursorama')
+    amounts = df['Recette'].fillna(-df['Dépense'])
+    export = pd.DataFrame({'dateOp': df['Date'],
+                           'dateVal': df['Date'],
+                           'label': df['Description'],
+                           'category': 'Non catégorisé',
+                           'categoryParent': 'Non catégorisé',
+                           'supplierFound': '',
+                           'amount': amounts,
+                           'comment': '',
+                           'accountNum': '00040000000',
+                           'accountLabel': 'BOURSORAMA BANQUE',
+                           'accountbalance': amounts.cumsum().round(2)})
+    export.to_csv(filepath, sep=';', quotechar='"', decimal=',', index=False)
+
+
+def create_comptes_history(engine, count: int, seed: int = 0, end_date: dt.date = dt.date(2024, 12, 31),
+                           pending: int = 200) -> list:
+    """ Creates the tables and fills the comptes table with a history of movements over the accounts.
+    The last movements are pending ones, dated within the last 31 days, a tenth of them cheques.
+
+    :return: the pending movements, as the dictionaries inserted"""
+    from sqlalchemy import insert
+    from sqlalchemy.orm import Session
+    from pyfin.database import Base, Job, Mouvement
+
+    rng = np.random.default_rng(seed)
+    Base.metadata.create_all(engine)
+    with Session(engine) as session:
+        job = Job(job_key='history', job_timestamp=dt.datetime.combine(end_date, dt.time()))
+        session.add(job)
+        session.flush()
+        job_id = job.job_id
+        session.commit()
+
+    history = count - pending
+    offsets = np.sort(rng.integers(31, 3650, history))[::-1]
+    amounts = np.round(rng.lognormal(3, 1.2, count), 2)
+    compte = rng.integers(0, len(accounts), count)
+    category = rng.integers(0, len(categories), count)
+    pending_offsets = rng.integers(0, 31, pending)
+    rows = []
+    for i in range(count):
+        date = end_date - dt.timedelta(days=int(offsets[i] if i < history else pending_offsets[i - history]))
+        rows.append({'no': i, 'date': date, 'description': f'Mouvement {i}', 'depense': float(amounts[i]),
+                     'compte': accounts[compte[i]], 'categorie': categories[category[i]], 'mois': date,
+                     'date_insertion': date, 'date_out_of_bound': False, 'job_id': job_id,
+                     'no_de_reference': f'{i:07d}' if i >= history and i % 10 == 0 else None})
+    with Session(engine) as session:
+        for start in range(0, count, 50000):
+            session.execute(insert(Mouvement), rows[start:start + 50000])
+        session.commit()
+    return rows[history:]
+
+
+def generate_candidates(pending: list, count: int, account: str, seed: int = 0,
+                        end_date: dt.date = dt.date(2024, 12, 31)) -> pd.DataFrame:
+    """ Returns the frame imported by the mode 7 for an account : half of the pending movements of the account
+    come back from the bank, the other rows are new"""
+    rng = np.random.default_rng(seed)
+    matching = [m for m in pending if m['compte'] == account][::2]
+    new = count - len(matching)
+    dates = [end_date - dt.timedelta(days=int(d)) for d in rng.integers(0, 31, new)]
+    return pd.DataFrame({'Index': range(count),
+                         'Date': [m['date'] for m in matching] + dates,
+                         'Description': [f'Banque {m["description"]}' for m in matching] +
+                                        [f'Nouveau {i}' for i in range(new)],
+                         'Recette': None,
+                         'Dépense': [m['depense'] for m in matching] + np.round(rng.lognormal(3, 1.2, new), 2).tolist(),
+                         'Compte': account,
+                         'Catégorie': '',
+                         'Mois': [m['date'] for m in matching] + dates,
+                         'InsertDate': end_date,
+                         'Numéro de référence': [m['no_de_reference'] or '' for m in matching] + [''] * new,
+                         'Organisme': 'nan',
+                         'Déclarant': 'nan',
+                         'Employeur': 'nan'})
+
+
+def write_comptes_workbook(filepath: Path, count: int, seed: int = 0, sheet_name: str = 'Mouvements'):
+    """ Writes a comptes workbook : a header row, the history of movements, then a styled empty template row"""
+    from odf.opendocument import OpenDocumentSpreadsheet
+    from odf.table import Table, TableRow, TableCell
+    import pyfin.odfpandas as op
+
+    df = generate_statement_frame(count, generate_keywords(200, seed), seed)
+    wb = OpenDocumentSpreadsheet()
+    table = Table(name=sheet_name)
+    header = TableRow()
+    for title in ['N°', 'Date', 'Description', 'Dépense', 'Recette', 'Compte']:
+        header.addElement(op.generate_table_cell_text(title))
+    table.addElement(header)
+    for i, (d, description, depense, recette, compte) in enumerate(
+            zip(df['Date'], df['Description'], df['Dépense'].fillna(0), df['Recette'].fillna(0), df['Compte'])):
+        row = TableRow()
+        row.addElement(op.generate_table_cell_float(float(i)))
+        row.addElement(op.generate_table_cell_datetime(dt.datetime.combine(d, dt.time())))
+        row.addElement(op.generate_table_cell_text(description))
+        row.addElement(op.generate_table_cell_float(float(depense)))
+        row.addElement(op.generate_table_cell_float(float(recette)))
+        row.addElement(op.generate_table_cell_text(compte))
+        table.addElement(row)
+    template = TableRow()
+    for style in ['index', 'date', 'text', 'amount', 'amount', 'text']:
+        template.addElement(TableCell(stylename=style))
+    table.addElement(template)
+    wb.spreadsheet.addElement(table)
+    wb.write(filepath)
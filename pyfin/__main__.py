@@ -1,19 +1,21 @@
 import sys
+import logging
 from pathlib import Path
+from typing import TYPE_CHECKING
 
-import pandas as pd
-
-from pyfin.coremodel import Extractor, convert_last_updates_to_frame
 import datetime as dt
-import pyfin.extractors as extractors
-import pyfin.coremodel as c
-import pyfin.store as s
-import pyfin.indexfinder
 from pyfin.logger import write_log_entry
 from pyfin.logger import write_log_section
+from pyfin.logger import is_enabled
+from pyfin.logger import configure_logging, shutdown_logging
 from pyfin.configmanager import AppConfiguration
-from pyfin.database import get_finance_engine, get_last_updates_by_account, get_map_categories_dataframe
-from pyfin.database import get_map_categories
+from pyfin.instrumentation import instrumentation, stage, run_stage
+
+# the heavy modules (pandas, SQLAlchemy, the spreadsheet and google libraries) are imported by the commands needing them
+if TYPE_CHECKING:
+    import pandas as pd
+    from pyfin.coremodel import Extractor
+    from pyfin.statementcache import StatementCache
 
 
 def get_help() -> str:
@@ -34,15 +36,19 @@ def get_help() -> str:
              "--csv-only: exports only to csv" \
              "--test-mode : loads from a fictitious dataset" \
              "--simulate : only simulates the loading, without commit" \
-             "--new-mode : new, account-specific loading mechanism"
+             "--new-mode : new, account-specific loading mechanism" \
+             "--migrate : creates the missing indexes of the database, and exits" \
+             "--jobs [number] : runs the extractors concurrently, default : 1" \
+             "--no-cache : parses the statement files again instead of using the cache" \
+             "--log-level [DEBUG|INFO|WARNING|ERROR] : sets the level of the log entries, default : INFO" \
+             "--log-json [path] : also appends the log entries to a file, as JSON lines" \
+             "--report [path] : writes the timings and row counts of the import stages as a JSON report"
 
     return result
 
 
 def main(args=None, config_file: Path = None):
     """ main function to run the tool"""
-    write_log_section('Starting the program')
-
     intervaltype = 'week'
     intervalcount = 1
     interval_manual_mode = False
@@ -53,14 +59,18 @@ def main(args=None, config_file: Path = None):
     mode = 'none'
     simulate = False
     new_mode = False
+    migrate = False
+    jobs = 1
+    use_cache = True
+    list_mappings = False
+    log_level = 'INFO'
+    log_json = None
+    report = None
 
     # retrieving the args
     if args is None:
         args = sys.argv[1:]
 
-    # print the args
-    write_log_entry(__file__, f'arguments : {args}')
-
     for i in range(len(args)):
         if args[i] == '--interval-type':
             intervaltype = args[i + 1]
@@ -86,11 +96,41 @@ def main(args=None, config_file: Path = None):
             simulate = True
         if args[i] == '--new-mode':
             new_mode = True
+        if args[i] == '--migrate':
+            migrate = True
+        if args[i] == '--jobs':
+            jobs = args[i + 1] if i + 1 < len(args) else ''
+            if not jobs.isdigit() or int(jobs) < 1:
+                print(f'--jobs expects a positive number of concurrent extractions, got "{jobs}"\n' + get_help())
+                return
+            jobs = int(jobs)
+        if args[i] == '--no-cache':
+            use_cache = False
+        if args[i] == '--list-mappings':
+            list_mappings = True
+        if args[i] == '--log-level':
+            log_level = args[i + 1]
+        if args[i] == '--log-json':
+            log_json = Path(args[i + 1])
+        if args[i] == '--report':
+            report = Path(args[i + 1])
         if args[i] == '--help':
             print(get_help())
             return
 
-    if mode == 'none':
+    # the entries are written from a background thread, the pending ones are written at exit
+    configure_logging(log_level, log_json)
+    write_log_section('Starting the program')
+    started = dt.datetime.now()
+    instrumentation.reset()
+    # print the args
+    write_log_entry(__file__, 'arguments : %s', args)
+
+    if list_mappings:
+        list_configured_mappings(config_file)
+        return
+
+    if mode == 'none' and not migrate:
         raise ValueError('No mode was selected (ODS, or SQL)')
 
     # set the options
@@ -98,12 +138,33 @@ def main(args=None, config_file: Path = None):
 
     # load config
     appconfig = AppConfiguration(config_file)
+    from pyfin.database import get_finance_engine, get_map_categories, configure_finance_engine, engine_registry
+    from pyfin.database import migrate_schema
+
+    # one pooled engine is shared by the whole run
+    configure_finance_engine(appconfig.database_url, appconfig.database_pool_size, appconfig.database_pool_pre_ping)
+    finengine = get_finance_engine()
 
-    # load category mappings
-    write_log_entry(__file__, f'loading the category mappings from the database')
-    mapcategories = get_map_categories()
-    mapcategoriesdf = get_map_categories_dataframe()
-    write_log_entry(__file__, f'category mappings loaded : {len(mapcategories)} found')
+    if migrate:
+        write_log_section('Migrating the database schema')
+        created = migrate_schema(finengine)
+        write_log_entry(__file__, f'indexes created : {created}' if len(created) > 0 else 'schema already up to date')
+        engine_registry.dispose()
+        return
+
+    # the cache of the parsed statements
+    cache = None
+    if use_cache and appconfig.cache_enabled and not get_index:
+        from pyfin.statementcache import StatementCache
+        cache = StatementCache(appconfig.cache_folder, appconfig.cache_max_age_days, appconfig.cache_max_size_mb)
+        write_log_entry(__file__, f'statement cache in {cache.folder}, {cache.evict()} entries evicted')
+
+    # load category mappings (the account-specific mode loads them with its import context)
+    mapcategories = []
+    if not new_mode and not get_index:
+        write_log_entry(__file__, f'loading the category mappings from the database')
+        mapcategories = get_map_categories(finengine)
+        write_log_entry(__file__, f'category mappings loaded : {len(mapcategories)} found')
 
     # set the exclusion list
     # Deactivate the exclusion mechanism
@@ -119,29 +180,61 @@ def main(args=None, config_file: Path = None):
     write_log_entry(__file__, f' interval type : {intervaltype}')
     write_log_entry(__file__, f' interval count : {intervalcount}')
     write_log_entry(__file__, f' google drive location : {appconfig.service_account_key}')
-    write_log_entry(__file__, f'periodization threshold: {appconfig.periodization_threshold}')
+    # the periodization is opt-in : the threshold was always written to the configuration files
+    periodization_threshold = appconfig.periodization_threshold if appconfig.periodization_enabled else None
+    write_log_entry(__file__, f'periodization threshold: {periodization_threshold}')
     write_log_entry(__file__, f'mode : {mode}')
+    write_log_entry(__file__, f'concurrent extractions : {jobs}')
+    write_log_entry(__file__, f'statements read down to the watermark : {appconfig.stop_at_watermark}')
     write_log_entry(__file__, f'new account-pecific mode activated' if new_mode else f'classic mode')
 
     # LAUNCH THE IMPORT
     if new_mode:
         import_mode_2(appconfig.tablecomptes, intervaltype, intervalcount,
                       appconfig.download_folder, appconfig.ca_subfolder,
-                      appconfig.service_account_key, testmode, exclusion_list, appconfig.mapping_file, mapcategoriesdf,
-                      simulate, archive)
+                      appconfig.service_account_key, testmode, exclusion_list, appconfig.mapping_file,
+                      simulate, archive, jobs, cache, appconfig.stop_at_watermark)
     else:
         import_mode_1(get_index, mode, appconfig.extract_folder, appconfig.tablecomptes, intervaltype, intervalcount,
                       interval_manual_mode, appconfig.download_folder, appconfig.ca_subfolder, appconfig.comptes_folder,
                       appconfig.service_account_key, testmode, exclusion_list, appconfig.mapping_file, mapcategories,
-                      csv_only, simulate, archive)
+                      csv_only, simulate, archive, jobs, cache, periodization_threshold)
+
+    # the measures of the import stages
+    if len(instrumentation.get_records()) > 0:
+        write_log_section('Stage measures')
+        write_log_entry(__file__, 'timings and row counts :\n%s', instrumentation.get_summary())
+        if report is not None:
+            instrumentation.write_report(report, started=started, arguments=args, mode=mode, new_mode=new_mode)
+            write_log_entry(__file__, f'report written to {report}')
+
+    # close the pooled connections
+    engine_registry.dispose()
+    shutdown_logging()
+
+
+def list_configured_mappings(config_file: Path = None):
+    """ Prints the category mappings configured in the database"""
+    appconfig = AppConfiguration(config_file)
+    from pyfin.database import get_map_categories, configure_finance_engine, engine_registry
+
+    configure_finance_engine(appconfig.database_url, appconfig.database_pool_size, appconfig.database_pool_pre_ping)
+    write_log_section('Configured category mappings')
+    for m in get_map_categories():
+        print(f'{m.keyword} -> {m.categorie}' + (' (inactive)' if m.inactif else ''))
+    engine_registry.dispose()
 
 
 def import_mode_1(get_index: bool, mode: str, extract_folder: str, tablecomptes, intervaltype: str, intervalcount: int,
                   interval_manual_mode: bool, download_folder: str, ca_subfolder: str, comptes_folder: str,
                   service_account_key: str,
                   testmode: bool, exclusion_list, mapping_file: str, mapcategories, csv_only: bool,
-                  simulate: bool, archive: bool):
-    # Create an engine
+                  simulate: bool, archive: bool, jobs: int = 1, cache: 'StatementCache' = None,
+                  periodization_threshold: float = None):
+    import pyfin.indexfinder
+    from pyfin.database import get_finance_engine
+
+    # Get the shared engine
     finengine = get_finance_engine()
 
     if get_index:
@@ -154,6 +247,10 @@ def import_mode_1(get_index: bool, mode: str, extract_folder: str, tablecomptes,
             last_index = pyfin.indexfinder.get_index_from_database(finengine, tablecomptes)
             write_log_entry(__file__, f'the last index from the database is : {last_index}')
     else:
+        import pyfin.registry as registry
+        import pyfin.coremodel as c
+        import pyfin.store as s
+
         # Calculate the last index and start, end dates
         write_log_section('Connecting to the previous exports')
         lastcompte = pyfin.indexfinder.get_latest_file(Path(extract_folder))
@@ -216,8 +313,9 @@ def import_mode_1(get_index: bool, mode: str, extract_folder: str, tablecomptes,
         write_log_entry(__file__, f'setting the time interval : {start_date} to {end_date}')
 
         # getting the extractors
-        ex = extractors.get_extractors(download_folder, ca_subfolder,
-                                       authentification_key=service_account_key, test_mode=testmode)
+        # only the sources with new data are imported and created
+        ex = registry.get_extractors(registry.ExtractorSettings(download_folder, ca_subfolder,
+                                                                service_account_key, cache), test_mode=testmode)
 
         # set expected columns
         headers = ['Date', 'Index', 'Description', 'Dépense', 'Numéro de référence',
@@ -229,9 +327,11 @@ def import_mode_1(get_index: bool, mode: str, extract_folder: str, tablecomptes,
         df_list = []
         # 1st step : iterate over the extractors
         write_log_section('Extract')
-        for e in ex:
+        extracted = c.extract_all(ex, jobs)
+        # the extractors run in another process come back with their state
+        ex = [e for e, df in extracted]
+        for e, df in extracted:
             write_log_section(f'Extractor : {e.name}')
-            df = e.get_data()
             if df is None:
                 write_log_entry(__file__, 'no extract found')
             else:
@@ -255,46 +355,46 @@ def import_mode_1(get_index: bool, mode: str, extract_folder: str, tablecomptes,
 
         if len(df_list) > 0:
             write_log_entry(__file__, f'concatenating {len(df_list)} frames')
-            global_df = c.concat_frames(df_list, headers)
+            global_df = run_stage('concat', c.concat_frames, df_list, headers)
 
             write_log_entry(__file__, 'adding extra columns')
-            global_df = c.add_extra_columns(global_df)
+            global_df = run_stage('add_extra_columns', c.add_extra_columns, global_df)
 
             write_log_entry(__file__, f'filtering by date')
-            global_df = c.filter_by_date(global_df, start_date, end_date)
+            global_df = run_stage('filter_by_date', c.filter_by_date, global_df, start_date, end_date)
 
-            write_log_entry(__file__, f'setting excluded records')
-            global_df = c.set_exclusion(global_df, exclusion_list)
+            write_log_entry(__file__, f'setting excluded records, formatting the Description, parsing the check number')
+            global_df = run_stage('normalize_descriptions', c.normalize_descriptions, global_df, exclusion_list)
             write_log_entry(__file__, f'records excluded : {len(global_df[global_df["excluded"] == True])} records')
 
-            write_log_entry(__file__, f'formatting the Description')
-            global_df['Description'] = c.format_description(global_df['Description'])
-
-            write_log_entry(__file__, f'parsing the check number')
-            global_df['Numéro de référence'] = c.parse_numero_cheque(global_df['Description'])
-
             write_log_entry(__file__, f'removing the zeroes')
-            global_df = c.remove_zeroes('Dépense', global_df)
-            global_df = c.remove_zeroes('Recette', global_df)
+            global_df = run_stage('remove_zeroes', c.remove_zeroes, 'Dépense', global_df)
+            global_df = run_stage('remove_zeroes', c.remove_zeroes, 'Recette', global_df)
 
             write_log_entry(__file__, f'mapping to categories,using configured mapping file {mapping_file}')
-            global_df = c.map_categories(global_df, mapcategories)
+            global_df = run_stage('map_categories', c.map_categories, global_df, mapcategories)
+
+            # the spread rows would not match the pending movements reconciled by the sql2 mode
+            if periodization_threshold is not None and mode != 'sql2':
+                write_log_entry(__file__, f'spreading the expenses of at least {periodization_threshold} over the year')
+                global_df = run_stage('explode_values', c.explode_values, global_df, 'Dépense', 'Mois',
+                                      threshold=periodization_threshold)
 
             write_log_entry(__file__, f'adding the current date as insertion date')
-            global_df = c.add_insertdate(global_df, dt.date.today())
+            global_df = run_stage('add_insertdate', c.add_insertdate, global_df, dt.date.today())
 
             # split the dataframe
-            current, excluded, anterior = c.split_dataframes(global_df)
+            current, excluded, anterior = run_stage('split_dataframes', c.split_dataframes, global_df)
             write_log_entry(__file__, f'dataframes split, current rows : {len(current)}, '
                                       f'excluded rows : {len(excluded)}, '
                                       f'anterior rows : {len(anterior)}')
 
             # setting the index
             write_log_entry(__file__, f'setting the index at {start_index}')
-            current = c.set_index('Index', start_index, current)
+            current = run_stage('set_index', c.set_index, 'Index', start_index, current)
 
-            s.store_frame(current, excluded, anterior,
-                          ['Bureau', 'ca_extract.csv'], ['Bureau', 'ca_excluded.csv'], ['Bureau', 'ca_anterior.csv'])
+            run_stage('store_csv', s.store_frame, current, excluded, anterior,
+                      ['Bureau', 'ca_extract.csv'], ['Bureau', 'ca_excluded.csv'], ['Bureau', 'ca_anterior.csv'])
 
             if not csv_only:
                 if mode == 'ods':
@@ -302,21 +402,21 @@ def import_mode_1(get_index: bool, mode: str, extract_folder: str, tablecomptes,
                     odscomptes = pyfin.indexfinder.get_latest_file(Path(comptes_folder))
                     if odscomptes is None:
                         raise TypeError(f'could not find a proper comptes file in {comptes_folder}')
-                    s.store_frame_to_ods(current, odscomptes, 'Mouvements')
+                    run_stage('store_ods', s.store_frame_to_ods, current, odscomptes, 'Mouvements')
                 if mode == 'sql':
                     # Writing to the database
-                    s.store_frame_to_sql(current, finengine, 'comptes')
+                    run_stage('store_sql', s.store_frame_to_sql, current, finengine, 'comptes')
                 if mode == 'sql2':
                     # Writing to the database with an improved mechanism
-                    s.store_frame_to_sql_mode_7(current, finengine, start_date, end_date, start_index,
-                                                simulate=simulate)
+                    run_stage('store_sql', s.store_frame_to_sql_mode_7, current, finengine, start_date, end_date,
+                              start_index, simulate=simulate)
 
             write_log_entry(__file__, f'{len(current)} rows stored')
             # analysis
-            write_log_entry(__file__, f'columns :')
-            print(global_df.columns)
-            write_log_entry(__file__, f'counts by date status')
-            print(global_df.groupby('DateFilter')['Index'].count())
+            write_log_entry(__file__, 'columns :\n%s', global_df.columns, level=logging.DEBUG)
+            if is_enabled(__file__, logging.DEBUG):
+                write_log_entry(__file__, 'counts by date status :\n%s', global_df.groupby('DateFilter')['Index'].count(),
+                                level=logging.DEBUG)
         else:
             write_log_entry(__file__, '0 rows to import')
 
@@ -330,34 +430,36 @@ def import_mode_1(get_index: bool, mode: str, extract_folder: str, tablecomptes,
 def import_mode_2(tablecomptes, intervaltype: str, intervalcount: int,
                   download_folder: str, ca_subfolder: str,
                   service_account_key: str,
-                  testmode: bool, exclusion_list, mapping_file: str, mapcategoriesdf,
-                  simulate: bool, archive: bool):
+                  testmode: bool, exclusion_list, mapping_file: str,
+                  simulate: bool, archive: bool, jobs: int = 1, cache: 'StatementCache' = None,
+                  stop_at_watermark: bool = False):
     write_log_section('launching new import mode')
+    import pyfin.registry as registry
+    import pyfin.coremodel as c
+    import pyfin.store as s
+    from pyfin.database import get_finance_engine, ImportContext
 
-    # Create an engine
+    # Get the shared engine
     finengine = get_finance_engine()
 
-    # Initializing the index
-    try:
-        start_index = pyfin.indexfinder.get_index_from_database(finengine, tablecomptes)
-        write_log_entry(__file__, f'Index initialized to {start_index}')
-    except Exception as e:
-        write_log_entry(__file__, f'Could not find a proper index in the database'
-                                  f'Error : {e}'
-                                  f'Defaulting to 0 instead')
-        start_index = 0
-
     # Initializing the indexes
     start_date, end_date = c.get_interval(interval_type=intervaltype, interval_count=intervalcount)
     write_log_entry(__file__, f'start and and date initialized to : {start_date}-{end_date}')
 
-    # getting the last update dates
-    last_updates = convert_last_updates_to_frame(get_last_updates_by_account())
-    write_log_entry(__file__, f'last updates retrieved : {len(last_updates)} accounts')
-
     # getting the extractors
-    ex = extractors.get_extractors(download_folder, ca_subfolder,
-                                   authentification_key=service_account_key, test_mode=testmode)
+    # only the sources with new data are imported and created
+    ex = registry.get_extractors(registry.ExtractorSettings(download_folder, ca_subfolder, service_account_key,
+                                                            cache, stop_at_watermark), test_mode=testmode)
+
+    # loading the index, the last update dates, the mappings and the pending movements at once
+    with stage('load_context'):
+        context = ImportContext().load(finengine, [e.name for e in ex], start_date, end_date)
+    start_index = context.next_index
+    write_log_entry(__file__, f'Index initialized to {start_index}')
+    write_log_entry(__file__, f'last updates retrieved : {len(context.last_updates)} accounts')
+    mapcategoriesdf = context.get_map_categories_dataframe()
+    keyword_matcher = c.KeywordMatcher(mapcategoriesdf['Keyword'].tolist())
+    write_log_entry(__file__, f'category mappings loaded : {len(mapcategoriesdf)} active')
 
     # set expected columns
     headers = ['Date', 'Index', 'Description', 'Dépense', 'Numéro de référence',
@@ -366,10 +468,11 @@ def import_mode_2(tablecomptes, intervaltype: str, intervalcount: int,
 
     e: Extractor
     df: pd.DataFrame
-    # 1st step : iterate over the extractors
-    for e in ex:
+    # 1st step : extract, concurrently if requested, then iterate over the extractors in order
+    # the rows older than the last update of each account are skipped by the extractors
+    extracted = c.extract_all(ex, jobs, since={e.name: context.get_start_date(e.name, start_date) for e in ex})
+    for e, df in extracted:
         write_log_section(f'Extractor : {e.name}')
-        df = e.get_data()
         if df is None:
             write_log_entry(__file__, 'no extract found')
         else:
@@ -384,61 +487,56 @@ def import_mode_2(tablecomptes, intervaltype: str, intervalcount: int,
             pass
         # all good, we add the data
         if not df is None:
-            try:
-                last_update = last_updates.loc[e.name, 'LastUpdate']
-                write_log_entry(__file__, f'last update date : {last_update}')
-                start_date = last_update
-            except KeyError:
+            account_start_date = context.get_start_date(e.name, start_date)
+            if e.name in context.last_updates:
+                write_log_entry(__file__, f'last update date : {account_start_date}')
+            else:
                 write_log_entry(__file__, 'could not find a last update date. Defaulting to start date instead...')
 
             write_log_entry(__file__, 'adding extra columns : économie, réglé, mois')
-            df = c.add_extra_columns(df)
+            df = run_stage('add_extra_columns', c.add_extra_columns, df, group=e.name)
 
             write_log_entry(__file__, f'filtering by date')
-            df = c.filter_by_date(df, start_date, end_date)
+            df = run_stage('filter_by_date', c.filter_by_date, df, account_start_date, end_date, group=e.name)
 
-            write_log_entry(__file__, f'setting excluded records')
-            df = c.set_exclusion(df, exclusion_list)
+            write_log_entry(__file__, f'setting excluded records, switching the Description to camelcase, '
+                                      f'parsing the check number')
+            df = run_stage('normalize_descriptions', c.normalize_descriptions, df, exclusion_list, group=e.name)
             write_log_entry(__file__, f'records excluded : {len(df[df["excluded"] == True])} records')
 
-            write_log_entry(__file__, f'formatting the Description by switching to camelcase')
-            df['Description'] = c.format_description(df['Description'])
-
-            write_log_entry(__file__, f'parsing the check number')
-            df['Numéro de référence'] = c.parse_numero_cheque(df['Description'])
-
             write_log_entry(__file__, f'removing the zeroes')
-            df = c.remove_zeroes('Dépense', df)
-            df = c.remove_zeroes('Recette', df)
+            df = run_stage('remove_zeroes', c.remove_zeroes, 'Dépense', df, group=e.name)
+            df = run_stage('remove_zeroes', c.remove_zeroes, 'Recette', df, group=e.name)
 
             write_log_entry(__file__, f'mapping to keywords from map catégories table')
-            df = c.map_keywords(df, 'Description', mapcategoriesdf['Keyword'].tolist())
+            df = run_stage('map_keywords', c.map_keywords, df, 'Description', keyword_matcher, group=e.name)
 
             write_log_entry(__file__, f'enriching with the metadata from map_catégories table')
-            df = c.map_extradata(df, 'Keyword', mapcategoriesdf)
+            df = run_stage('map_extradata', c.map_extradata, df, 'Keyword', mapcategoriesdf, group=e.name)
 
             write_log_entry(__file__, f'adding the current date as insertion date')
-            df = c.add_insertdate(df, dt.date.today())
+            df = run_stage('add_insertdate', c.add_insertdate, df, dt.date.today(), group=e.name)
 
             # split the dataframe
-            current, excluded, anterior = c.split_dataframes(df)
+            current, excluded, anterior = run_stage('split_dataframes', c.split_dataframes, df, group=e.name)
             write_log_entry(__file__, f'dataframes split, current rows : {len(current)}, '
                                       f'excluded rows : {len(excluded)}, '
                                       f'anterior rows : {len(anterior)}')
             # setting the index
             write_log_entry(__file__, f'setting the index at {start_index}')
-            current = c.set_index('Index', start_index, current)
+            current = run_stage('set_index', c.set_index, 'Index', start_index, current, group=e.name)
 
             # Writing to the database with an improved mechanism
-            s.store_frame_to_sql_mode_7(current, finengine, start_date, end_date, start_index,
-                                        simulate=simulate, account_name=e.name)
+            run_stage('store_sql', s.store_frame_to_sql_mode_7, current, finengine, account_start_date, end_date,
+                      start_index, simulate=simulate, account_name=e.name,
+                      mvt_futurs=context.get_mouvements_by_account(account_start_date, e.name), group=e.name)
 
             write_log_entry(__file__, f'{len(current)} rows stored')
             # analysis
-            write_log_entry(__file__, f'columns :')
-            print(df.columns)
-            write_log_entry(__file__, f'counts by date status')
-            print(df.groupby('DateFilter')['Index'].count())
+            write_log_entry(__file__, 'columns :\n%s', df.columns, level=logging.DEBUG)
+            if is_enabled(__file__, logging.DEBUG):
+                write_log_entry(__file__, 'counts by date status :\n%s', df.groupby('DateFilter')['Index'].count(),
+                                level=logging.DEBUG)
             # increment
             start_index += len(current)
             # archiving
@@ -2,32 +2,111 @@
 import pandas as pd
 import datetime as dt
 import re
+from pathlib import Path
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from contextlib import ExitStack
+import logging
+import multiprocessing
+import numpy as np
 from numpy import round
 from dateutil.relativedelta import relativedelta
-from pyfin.database import MapCategorie
 from collections.abc import Iterable
+from typing import TYPE_CHECKING
+
+from pyfin.instrumentation import instrumentation, measure, count_rows
+from pyfin.logger import root_logger_name, forward_worker_logs, configure_worker_logging
+
+# only needed for the annotations : the database module loads SQLAlchemy
+if TYPE_CHECKING:
+    from pyfin.database import MapCategorie
+    from pyfin.statementcache import StatementCache
 
 
 # TODO declare a keyword for the last update column name
 
 class Extractor:
     """ Abstract base class which implements the required methods"""
+    # how the extraction runs when extracting in parallel : 'thread' for the network or I/O bound extractors,
+    # 'process' for the CPU bound ones (the extractor is then pickled to the worker and back)
+    executor = 'thread'
+    # the version of the parsing, to be increased when the parsed data changes, so that the cached data is not used
+    version = 1
 
     @property
     def name(self) -> str:
         return self.__account_name__
 
-    def __init__(self, account_name: str, endpoint: str, archivepoint: str):
+    def __init__(self, account_name: str, endpoint: str, archivepoint: str, cache: 'StatementCache' = None):
+        """
+        :param cache: the StatementCache of the parsed statement files, if any"""
         self.__account_name__ = account_name
         self.__endpoint__ = endpoint
         self.__archivepoint__ = archivepoint
+        self.__cache__ = cache
 
-    def get_data(self) -> pd.DataFrame:
+    def get_data(self, since: dt.date = None) -> pd.DataFrame:
+        """ Returns the extracted data.
+
+        :param since: the watermark of the account, if any. The extractor may skip the rows or ranges older
+            than this date, as they would be filtered out afterwards anyway. The files are always read :
+            their modification time is not a reliable sign of their content"""
         return pd.DataFrame()
 
     def flush(self) -> bool:
         return True
 
+    def read_statement(self, f: Path, parse, variant: str = '') -> pd.DataFrame:
+        """ Parses a statement file, through the cache when there is one
+
+        :param parse: the function parsing the file into a dataframe
+        :param variant: what else the parsed data depends on, if anything, such as a watermark"""
+        if self.__cache__ is None:
+            return parse(f)
+        return self.__cache__.get_or_parse(f, self.name, self.version, parse, variant)
+
+
+def run_extractor(e: Extractor, since: dt.date = None) -> tuple:
+    """ Runs the extraction and returns the extractor along with its data and the measures of the extraction,
+    as the state of the extractor is lost when run in another process"""
+    with measure('extract', e.name) as record:
+        df = e.get_data(since=since)
+        record.rows_out = count_rows(df)
+    return e, df, record
+
+
+def extract_all(extractors: list, jobs: int = 1, since: dict = None) -> list:
+    """ Runs the extractors and returns the list of tuples (extractor, dataframe), in the order of the extractors.
+
+    :param jobs: the number of concurrent extractions. With 1, the extractors are run one after another
+    :param since: the watermark of each extractor, by extractor name"""
+    since = {} if since is None else since
+    if jobs <= 1 or len(extractors) <= 1:
+        results = [run_extractor(e, since.get(e.name)) for e in extractors]
+    else:
+        in_process = [e for e in extractors if e.executor == 'process']
+        with ExitStack() as pools:
+            threads = pools.enter_context(ThreadPoolExecutor(max_workers=jobs))
+            # the worker processes are only started for the extractors asking for them.
+            # They are spawned rather than forked, as forking copies the locks held by the logging thread,
+            # and they hand their log entries to this process
+            processes = None
+            if len(in_process) > 0:
+                context = multiprocessing.get_context('spawn')
+                records = pools.enter_context(forward_worker_logs(context))
+                level = logging.getLogger(root_logger_name).getEffectiveLevel()
+                processes = pools.enter_context(ProcessPoolExecutor(max_workers=min(jobs, len(in_process)),
+                                                                    mp_context=context,
+                                                                    initializer=configure_worker_logging,
+                                                                    initargs=(records, level)))
+            futures = [(processes if e.executor == 'process' else threads).submit(run_extractor, e, since.get(e.name))
+                       for e in extractors]
+            results = [f.result() for f in futures]
+    # the measures of the extractions are recorded in the parent process
+    for e, df, record in results:
+        instrumentation.add(record)
+    return [(e, df) for e, df, record in results]
+
 
 ######################
 # Matching functions #
@@ -43,11 +122,153 @@ def match_first_keyword(to_match: str, keywords: Iterable) -> str:
     return matches[0] if len(matches) > 0 else None
 
 
+class KeywordMatcher:
+    """ Finds the winning keyword (or rule) contained in a description.
+    The keywords are normalised once and compiled into an Aho-Corasick automaton,
+    so that a description is scanned once whatever the number of keywords.
+    With the default settings, gives the same result as match_first_keyword
+
+    :param keywords: the keywords, in mapping order
+    :param precedence: which keyword wins when several are found.
+        'first' : the first one in mapping order
+        'last' : the last one in mapping order
+        'longest' : the longest one, then the first one in mapping order
+    :param case: True for a case-sensitive search
+    :param regex: True to interpret the keywords as regular expressions.
+        Only the keywords containing special characters are then evaluated as such"""
+
+    __precedences__ = ('first', 'last', 'longest')
+    __special_characters__ = set('.^$*+?{}[]\\|()')
+
+    def __init__(self, keywords: Iterable, precedence: str = 'first', case: bool = False, regex: bool = False):
+        if precedence not in self.__precedences__:
+            raise ValueError(f'unknown precedence {precedence}, expected one of {self.__precedences__}')
+        self.__keywords__ = list(keywords)
+        self.__case__ = case
+        # the automaton : transitions, failure links and best (lowest) rank per state
+        self.__goto__ = [{}]
+        self.__fail__ = [0]
+        self.__output__ = [-1]
+        # an empty keyword is contained in any string
+        self.__empty__ = -1
+        # the keywords which have to be evaluated as regular expressions, with their rank
+        self.__patterns__ = []
+
+        # rank the keywords : the lower rank wins
+        if precedence == 'first':
+            order = list(range(len(self.__keywords__)))
+        elif precedence == 'last':
+            order = list(reversed(range(len(self.__keywords__))))
+        else:
+            order = sorted(range(len(self.__keywords__)), key=lambda i: (-len(self.__keywords__[i]), i))
+        self.__positions__ = order
+
+        for rank, position in enumerate(order):
+            keyword = self.__keywords__[position]
+            if regex and not self.__special_characters__.isdisjoint(keyword):
+                self.__patterns__.append((rank, re.compile(keyword, 0 if case else re.IGNORECASE)))
+            else:
+                self.__add_keyword__(keyword if case else keyword.lower(), rank)
+        self.__build_failure_links__()
+
+    def __add_keyword__(self, keyword: str, rank: int):
+        if keyword == '':
+            if self.__empty__ == -1:
+                self.__empty__ = rank
+            return
+        state = 0
+        for char in keyword:
+            following = self.__goto__[state].get(char)
+            if following is None:
+                self.__goto__.append({})
+                self.__fail__.append(0)
+                self.__output__.append(-1)
+                following = len(self.__goto__) - 1
+                self.__goto__[state][char] = following
+            state = following
+        if self.__output__[state] == -1:
+            self.__output__[state] = rank
+
+    def __build_failure_links__(self):
+        queue = deque(self.__goto__[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, following in self.__goto__[state].items():
+                queue.append(following)
+                fallback = self.__fail__[state]
+                while fallback != 0 and char not in self.__goto__[fallback]:
+                    fallback = self.__fail__[fallback]
+                self.__fail__[following] = self.__goto__[fallback].get(char, 0)
+                # a state also reports the keywords ending on its failure link
+                inherited = self.__output__[self.__fail__[following]]
+                if inherited != -1 and (self.__output__[following] == -1 or inherited < self.__output__[following]):
+                    self.__output__[following] = inherited
+
+    @property
+    def keywords(self) -> list:
+        return self.__keywords__
+
+    def __match_rank__(self, to_match: str) -> int:
+        goto = self.__goto__
+        fail = self.__fail__
+        output = self.__output__
+        best = self.__empty__
+        state = 0
+        for char in (to_match if self.__case__ else to_match.lower()):
+            if best == 0:
+                break
+            while state != 0 and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            found = output[state]
+            if found != -1 and (best == -1 or found < best):
+                best = found
+        for rank, pattern in self.__patterns__:
+            if best != -1 and best < rank:
+                break
+            if pattern.search(to_match):
+                best = rank
+                break
+        return best
+
+    def match_position(self, to_match: str) -> int:
+        """ Returns the position of the winning keyword found in the string, -1 if none"""
+        if not isinstance(to_match, str):
+            return -1
+        rank = self.__match_rank__(to_match)
+        return self.__positions__[rank] if rank != -1 else -1
+
+    def match(self, to_match: str) -> str:
+        """ Returns the winning keyword found in the string, None if none"""
+        position = self.match_position(to_match)
+        return self.__keywords__[position] if position != -1 else None
+
+    def match_positions(self, ds: pd.Series) -> pd.Series:
+        """ Returns the position of the winning keyword for each row, -1 if none.
+        Each distinct description is scanned only once"""
+        distinct = {value: self.match_position(value) for value in pd.unique(ds)}
+        return ds.map(distinct).astype(int)
+
+    def match_series(self, ds: pd.Series) -> pd.Series:
+        """ Matches a whole series, scanning each distinct description only once"""
+        distinct = {value: self.match(value) for value in pd.unique(ds)}
+        return ds.map(distinct)
+
+
 def shift_month(value: dt.date, monthshift: int) -> dt.date:
     """ Shifts the given date by a number of months (positive or negative)"""
     return value.replace(day=1) + relativedelta(months=monthshift)
 
 
+def shift_months(dates: pd.Series, monthshifts: pd.Series) -> pd.Series:
+    """ Vectorised version of shift_month : brings each date to the first day of its month,
+    then shifts it by the number of months (positive or negative, NaN meaning no shift)"""
+    months = pd.to_datetime(dates).to_numpy().astype('datetime64[M]')
+    shifts = monthshifts.fillna(0).to_numpy().astype('int64').astype('timedelta64[M]')
+    shifted = pd.Series((months + shifts).astype('datetime64[ns]'), index=dates.index)
+    return shifted.dt.date
+
+
 def get_interval(interval_type: str, interval_count: int):
     """ calculating the interval"""
     end_date = dt.date.today()
@@ -62,27 +283,49 @@ def get_interval(interval_type: str, interval_count: int):
     return start_date, end_date
 
 
+def get_exclusion_pattern(exclusion_list: Iterable) -> re.Pattern:
+    """ Combines the excluded keywords into one pattern, None if there is no excluded keyword"""
+    exclusions = list(exclusion_list)
+    return re.compile('|'.join(re.escape(e) for e in exclusions)) if len(exclusions) > 0 else None
+
+
 def set_exclusion(df: pd.DataFrame, exclusion_list: Iterable) -> pd.DataFrame:
-    df['excluded'] = df['Description'].apply(lambda x: any([e in x for e in exclusion_list]))
+    pattern = get_exclusion_pattern(exclusion_list)
+    if pattern is None or len(df) == 0:
+        df['excluded'] = False
+    else:
+        df['excluded'] = df['Description'].str.contains(pattern, na=False)
     return df
 
 
+# a cheque is a description with 'Cheque Emis' on its first line ; its number is the first group of 7 digits
+cheque_pattern = re.compile(r'^(?=.*Cheque Emis)[\s\S]*?([0-9]{7})')
+
+
 def extract_numero_cheque(libelle: str) -> str:
-    extract = re.findall('[0-9]{7}', libelle)
-    if re.match('.*Cheque Emis', libelle) and len(extract) > 0:
-        return extract[0]
-    else:
-        return ''
+    match = cheque_pattern.match(libelle)
+    return '' if match is None else match.group(1)
 
 
 def parse_numero_cheque(ds: pd.Series) -> pd.Series:
-    return ds.apply(extract_numero_cheque)
+    if len(ds) == 0:
+        return ds.astype(object)
+    return ds.str.extract(cheque_pattern, expand=False).fillna('')
 
 
 def format_description(ds: pd.Series) -> pd.Series:
     return ds.str.title()
 
 
+def normalize_descriptions(df: pd.DataFrame, exclusion_list: Iterable) -> pd.DataFrame:
+    """ The description stage of the pipeline : sets the excluded records on the raw descriptions,
+    formats the descriptions, then parses the cheque numbers"""
+    df = set_exclusion(df, exclusion_list)
+    df['Description'] = format_description(df['Description'])
+    df['Numéro de référence'] = parse_numero_cheque(df['Description'])
+    return df
+
+
 def add_extra_columns(df: pd.DataFrame) -> pd.DataFrame:
     df['Economie'] = ''
     df['Réglé'] = ''
@@ -128,8 +371,10 @@ def add_insertdate(df: pd.DataFrame, insertdate: dt.date) -> pd.DataFrame:
 
 
 def map_keywords(df: pd.DataFrame, searched_column: str, keywords: Iterable) -> pd.DataFrame:
-    """ Assigns the keyword to the searched for column"""
-    df['Keyword'] = df[searched_column].apply(match_first_keyword, keywords=keywords)
+    """ Assigns the keyword to the searched for column.
+    The keywords can be given as a list or as an already built KeywordMatcher"""
+    matcher = keywords if isinstance(keywords, KeywordMatcher) else KeywordMatcher(keywords)
+    df['Keyword'] = matcher.match_series(df[searched_column])
     return df
 
 
@@ -137,30 +382,32 @@ def map_extradata(df: pd.DataFrame, on: str, mc: pd.DataFrame) -> pd.DataFrame:
     """ Assigns the new months"""
     df = df.join(mc.set_index(on), on=on, how='left', rsuffix='.maps')
 
+    # the mapped values replace the existing ones, when there are some
     # assign category
-    df.loc[~df['Catégorie.maps'].isna(), 'Catégorie'] = df['Catégorie.maps']
+    df['Catégorie'] = df['Catégorie.maps'].where(df['Catégorie.maps'].notna(), df['Catégorie'])
     # Déclarant
-    df.loc[~df['déclarant'].isna(), 'Déclarant'] = df['déclarant']
-    df['Déclarant'] = df['Déclarant'].astype(str)
+    df['Déclarant'] = df['déclarant'].where(df['déclarant'].notna(), df.get('Déclarant', np.nan)).astype(str)
     # Organisme
-    df.loc[~df['organisme'].isna(), 'Organisme'] = df['organisme']
-    df['Organisme'] = df['Organisme'].astype(str)
+    df['Organisme'] = df['organisme'].where(df['organisme'].notna(), df.get('Organisme', np.nan)).astype(str)
     # Mois
-    df['monthshift'].fillna(0, inplace=True)
-    df['Mois'] = df.apply(lambda x: shift_month(x.Date, x.monthshift), axis=1)
+    df['monthshift'] = df['monthshift'].fillna(0)
+    df['Mois'] = shift_months(df['Date'], df['monthshift'])
     # Employeur
-    df.loc[~df['employeur'].isna(), 'Employeur'] = df['employeur']
-    df['Employeur'] = df['Employeur'].astype(str)
+    df['Employeur'] = df['employeur'].where(df['employeur'].notna(), df.get('Employeur', np.nan)).astype(str)
 
     return df
 
 
 def map_categories(df: pd.DataFrame, categories: Iterable) -> pd.DataFrame:
-    """ This function assumes the Catégorie column already exists"""
+    """ This function assumes the Catégorie column already exists.
+    As the keywords are regular expressions applied in order, the last matching mapping wins"""
     m: MapCategorie
+    categories = list(categories)
 
-    for m in categories:
-        df.loc[df['Description'].str.contains(m.keyword), 'Catégorie'] = m.categorie
+    matcher = KeywordMatcher([m.keyword for m in categories], precedence='last', case=True, regex=True)
+    positions = matcher.match_positions(df['Description']).to_numpy()
+    matched = positions != -1
+    df.loc[matched, 'Catégorie'] = [categories[p].categorie for p in positions[matched]]
 
     return df
 
@@ -186,16 +433,59 @@ def breakdown_period(value: dt.date, periods) -> []:
         return value
 
 
-def explode_values(df: pd.DataFrame, value_column: str, period_column: str, indexes) -> pd.DataFrame:
-    # set the periodizations
-    percol = 'periodize'
-    df[percol] = 1
-    df.loc[indexes, percol] = 12
-    df[value_column] = df.apply(lambda x: breakdown_value(x[value_column], x[percol]), axis=1)
-    df[period_column] = df.apply(lambda x: breakdown_period(x[period_column], x[percol]), axis=1)
-    df = df.explode([value_column, period_column])
-    df = df.drop(percol, axis=1)
-    return df
+def get_periodization_indexes(df: pd.DataFrame, value_column: str, threshold: float) -> pd.Index:
+    """ Returns the index of the rows whose value reaches the periodization threshold"""
+    return df.index[df[value_column].astype(float).abs() >= threshold]
+
+
+def explode_values(df: pd.DataFrame, value_column: str, period_column: str, indexes=None,
+                   periods: int = 12, start_month: int = 1, threshold: float = None) -> pd.DataFrame:
+    """ Spreads the value of the given rows over several monthly periods.
+    The value is split in cents, the rounding remainder going to the last period ;
+    the periods start at the given month of the year of the period column.
+
+    :param indexes: the labels of the rows to spread
+    :param periods: the number of periods
+    :param start_month: the month of the first period
+    :param threshold: when no indexes are given, the rows reaching this value are spread
+        (see AppConfiguration.periodization_threshold)"""
+    if indexes is None:
+        indexes = [] if threshold is None else get_periodization_indexes(df, value_column, threshold)
+    spread = df.index.isin(indexes) if periods > 1 else np.zeros(len(df), dtype=bool)
+
+    # one row per period
+    counts = np.where(spread, periods, 1)
+    result = df.iloc[np.repeat(np.arange(len(df)), counts)].copy()
+    exploded = np.repeat(spread, counts)
+    # rank of the period, for each resulting row
+    offsets = np.arange(len(result)) - np.repeat(np.cumsum(counts) - counts, counts)
+    offsets = offsets[exploded]
+
+    # the values, in cents
+    cents = np.rint(result[value_column].to_numpy()[exploded].astype(float) * 100)
+    share = np.rint(cents / periods)
+    values = np.where(offsets == periods - 1, cents - (periods - 1) * share, share) / 100
+
+    # the periods, as months since the epoch
+    years = pd.to_datetime(result[period_column][exploded]).dt.year.to_numpy()
+    months = (years - 1970) * 12 + (start_month - 1) + offsets
+    dates = months.astype('datetime64[M]').astype('datetime64[ns]')
+
+    value_position = result.columns.get_loc(value_column)
+    period_position = result.columns.get_loc(period_column)
+    if result[value_column].dtype != float:
+        result[value_column] = result[value_column].astype(object)
+    # the periods keep the type of the column : timestamps, or dates
+    periods_column = result[period_column]
+    if pd.api.types.is_datetime64_any_dtype(periods_column) or \
+            (len(periods_column) > 0 and isinstance(periods_column.iloc[0], pd.Timestamp)):
+        dates = pd.Series(dates).tolist()
+    else:
+        dates = pd.Series(dates).dt.date.to_numpy()
+        result[period_column] = periods_column.astype(object)
+    result.iloc[np.flatnonzero(exploded), value_position] = values
+    result.iloc[np.flatnonzero(exploded), period_position] = dates
+    return result
 
 
 def split_dataframes(df: pd.DataFrame) -> tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
@@ -4,56 +4,108 @@ import pandas as pd
 from pathlib import Path
 from pyfin.coremodel import Extractor
 import re
-import openpyxl
-import pygsheets
+from typing import TYPE_CHECKING
 import numpy as np
 import os
 import datetime as dt
+import logging
 
 from pyfin.database import get_map_categories
+from pyfin.statementcache import StatementCache
+from pyfin.sheetssession import SheetsSession
+from pyfin.registry import credit_agricole_files, boursorama_files
+from pyfin.logger import write_log_entry
+
+# openpyxl is imported when a statement is read
+if TYPE_CHECKING:
+    import openpyxl
 
 
 class ExtractorCreditAgricole(Extractor):
+    # parsing the xlsx files is CPU bound
+    executor = 'process'
+
     # Implemented interfaces
-    def __init__(self, endpoint: str, archivepoint: str):
-        super().__init__('Crédit Agricole', endpoint, archivepoint)
+    def __init__(self, endpoint: str, archivepoint: str, stop_at_watermark: bool = False,
+                 cache: StatementCache = None):
+        """
+        :param stop_at_watermark: True to stop reading a file at the first row older than the watermark,
+            the statements being sorted from the newest to the oldest row
+        :param cache: the StatementCache of the parsed statement files, if any"""
+        super().__init__('Crédit Agricole', endpoint, archivepoint, cache)
         self.__files__ = []
+        self.__stop_at_watermark__ = stop_at_watermark
 
-    def get_data(self) -> pd.DataFrame:
-        files = self.get_downloaded_releve(self.__endpoint__)
+    def get_data(self, since: dt.date = None) -> pd.DataFrame:
+        """ Reads the downloaded statements.
+
+        :param since: the watermark, if any : the rows older than this date are skipped"""
+        files = [f for f in self.get_downloaded_releve(self.__endpoint__) if f is not None]
         dataframes = []
-        # Iterating over the files
+        # Iterating over the files, batch by batch
         for f in files:
-            if f is None:
-                pass
+            if self.__cache__ is None:
+                dataframes += list(self.iter_releve(f, since))
+            elif self.__stop_at_watermark__ and since is not None:
+                # the file is only read down to the watermark : what is cached depends on the watermark
+                dataframes.append(self.read_statement(f, lambda path: self.read_releve(path, since),
+                                                      variant=f'since={since.isoformat()}'))
             else:
-                book: openpyxl.Workbook
-                book = openpyxl.open(f, read_only=True)
-
-                names = book.sheetnames
-                content = book[names[0]]
-
-                # goal create a clean table of values
-                df: pd.DataFrame
-                headers = []
-                values = []
-                start_of_values = False
-                for v in content.values:
-                    if start_of_values:
-                        values.append(list(v))
+                # the whole file is cached, then filtered, so that the entry serves any watermark
+                df = self.read_statement(f, self.read_releve)
+                if since is not None and len(df) > 0:
+                    df = df.loc[df['Date'] >= since]
+                dataframes.append(df)
+        self.__files__ = files
+
+        # concatenating the cleaned batches
+        if len(dataframes) > 0:
+            return pd.concat(dataframes)
+
+    def iter_releve(self, f: Path, since: dt.date = None, batch_size: int = 1000):
+        """ Streams a statement file as cleaned dataframes of at most batch_size rows.
+        The values start after the header row, whose first column is 'Date'.
+
+        :param since: the watermark, if any : the rows older than this date are skipped"""
+        import openpyxl
+
+        book: openpyxl.Workbook
+        book = openpyxl.open(f, read_only=True)
+        try:
+            content = book[book.sheetnames[0]]
+            headers = None
+            values = []
+            for v in content.values:
+                if headers is None:
                     if v[0] == 'Date':
                         headers = list(v)
-                        start_of_values = True
-                # create the dataframe
-                dataframes += [pd.DataFrame(data=values, columns=headers)]
-
-        # concatenating and cleaning
-        if len(dataframes) > 0:
-            df = pd.concat(dataframes)
-            df = self.clean_releve_ca(df)
-            self.__files__ = files
-            # end
-            return df
+                    continue
+                if v[0] is None:
+                    # blank row, which would be filtered out for lack of a date anyway
+                    continue
+                if since is not None and self.get_row_date(v[0]) < since:
+                    if self.__stop_at_watermark__:
+                        break
+                    continue
+                values.append(list(v))
+                if len(values) >= batch_size:
+                    yield self.clean_releve_ca(pd.DataFrame(data=values, columns=headers))
+                    values = []
+            if len(values) > 0:
+                yield self.clean_releve_ca(pd.DataFrame(data=values, columns=headers))
+        finally:
+            book.close()
+
+    def read_releve(self, f: Path, since: dt.date = None) -> pd.DataFrame:
+        """ Reads a statement file as a single cleaned dataframe
+
+        :param since: the watermark, if any : the rows older than this date are skipped"""
+        batches = list(self.iter_releve(f, since))
+        return pd.concat(batches) if len(batches) > 0 else pd.DataFrame()
+
+    @staticmethod
+    def get_row_date(value) -> dt.date:
+        return value.date() if isinstance(value, dt.datetime) else value
 
     def clean_releve_ca(self, raw_frame: pd.DataFrame) -> pd.DataFrame:
         # Transformations
@@ -80,7 +132,7 @@ class ExtractorCreditAgricole(Extractor):
     def get_downloaded_releve(self, endpoint: str) -> []:
         downloads = Path.home().joinpath(endpoint)
         f: Path
-        return [f for f in downloads.iterdir() if re.match(r'CA\d{8}_\d{6}', f.name)]
+        return [f for f in downloads.iterdir() if re.match(credit_agricole_files, f.name)]
 
     def flush(self) -> bool:
         archivefolder = Path.home().joinpath(self.__endpoint__, self.__archivepoint__)
@@ -94,21 +146,29 @@ class ExtractorCreditAgricole(Extractor):
 
 
 class ExtractorBoursorama(Extractor):
-    def __init__(self, endpoint: str, archivepoint: str):
-        super().__init__('Boursorama', endpoint, archivepoint)
+    # the cleaned statements are cached, instead of the raw ones
+    version = 2
+
+    def __init__(self, endpoint: str, archivepoint: str, cache: StatementCache = None):
+        super().__init__('Boursorama', endpoint, archivepoint, cache)
         self.__files__ = []
 
-    def get_data(self) -> pd.DataFrame:
+    def get_data(self, since: dt.date = None) -> pd.DataFrame:
         self.__files__ = self.get_downloaded_releve(self.__endpoint__)
         result = []
         for f in self.__files__:
-            df = pd.read_csv(f, sep=';', quotechar='"', thousands=' ', decimal=',',
-                             parse_dates=['dateOp', 'dateVal'])
+            # the cleaned statement is cached, then filtered, so that the entry serves any watermark
+            df = self.read_statement(f, lambda path: self.clean_releve_ba(self.read_releve(path)))
+            if since is not None:
+                df = df.loc[df['Date'] >= since]
             result += [df]
 
         if len(result) > 0:
-            df = pd.concat(result)
-            return self.clean_releve_ba(df)
+            return pd.concat(result)
+
+    @staticmethod
+    def read_releve(f: Path) -> pd.DataFrame:
+        return pd.read_csv(f, sep=';', quotechar='"', thousands=' ', decimal=',', parse_dates=['dateOp', 'dateVal'])
 
     def clean_releve_ba(self, raw_frame: pd.DataFrame) -> pd.DataFrame:
         # Transformations
@@ -132,7 +192,7 @@ class ExtractorBoursorama(Extractor):
     def get_downloaded_releve(self, endpoint: str) -> []:
         downloads = Path.home().joinpath(endpoint)
         f: Path
-        return [f for f in downloads.iterdir() if re.match(r'export-operations', f.name)]
+        return [f for f in downloads.iterdir() if re.match(boursorama_files, f.name)]
 
     def flush(self) -> bool:
         archivefolder = Path.home().joinpath(self.__endpoint__, self.__archivepoint__)
@@ -146,38 +206,34 @@ class ExtractorBoursorama(Extractor):
 
 
 class ExtractorLiquide(Extractor):
-    def __init__(self, account_name: str, endpoint: str, archivepoint: str, authentication_key: str):
+    def __init__(self, account_name: str, endpoint: str, archivepoint: str, authentication_key: str,
+                 session: SheetsSession = None):
+        """
+        :param session: the Google Sheets session, shared with the other cash extractors. One is created if missing"""
         super().__init__(account_name, endpoint, archivepoint)
         self.__authentication_key__ = authentication_key
+        self.__session__ = SheetsSession(authentication_key) if session is None else session
+        # the worksheet is downloaded with the ones of the other extractors
+        self.__session__.request(account_name)
 
-    def get_data(self) -> pd.DataFrame:
+    def get_data(self, since: dt.date = None) -> pd.DataFrame:
         if self.__authentication_key__ is None or self.__authentication_key__ == '':
             raise ValueError(f'No authentication key found for the extractor {self.name}')
 
-        pg = pygsheets.authorize(service_account_file=self.__authentication_key__)
-        # select the worksheet
-        wb = pg.open('Dépenses Liquides')
-        # get the worksheet
-        ws: pygsheets.Worksheet
-        # create a dict of the worksheets
-        wsdict = {ws.title: ws for ws in wb}
-        # select the worksheet
-        try:
-            ws = wsdict[self.__account_name__]
-        except KeyError:
-            raise KeyError(f'the sheet corresponding the the account name {self.__account_name__} was not found')
-        # extract the dataframe
-        cash_df = ws.get_as_df()
+        # extract the dataframe of the worksheet
+        cash_df = self.__session__.get_frame(self.__account_name__)
+        write_log_entry(__file__, 'worksheet %s :\n%s', self.__account_name__, cash_df, level=logging.DEBUG)
         # clean
-        print(cash_df)
-        result = self.clean_cash_info(cash_df)
+        result = self.clean_cash_info(cash_df, since)
         # end
         return result
 
-    def clean_cash_info(self, raw_frame: pd.DataFrame) -> pd.DataFrame:
+    def clean_cash_info(self, raw_frame: pd.DataFrame, since: dt.date = None) -> pd.DataFrame:
         # filter after a certain date
         raw_frame['Date'] = pd.to_datetime(raw_frame['Date'], format='%d/%m/%Y')
         raw_frame['Date'] = raw_frame['Date'].dt.date
+        if since is not None:
+            raw_frame = raw_frame.loc[raw_frame['Date'] >= since].copy()
 
         # transform the columns into numeric types
         for col in ['Dépense', 'Recette']:
@@ -195,8 +251,9 @@ class ExtractorLiquide(Extractor):
 
 
 class ExtractorTest(Extractor):
-    def get_data(self) -> pd.DataFrame:
-        """ creates a synthetic dataframe with all possible test cases"""
+    def get_data(self, since: dt.date = None) -> pd.DataFrame:
+        """ creates a synthetic dataframe with all possible test cases.
+        The watermark is ignored, as the out of bound test case is older on purpose"""
         headers = ['Date', 'Index', 'Description', 'Dépense', 'Numéro de référence',
                    'Recette', 'Compte', 'Catégorie',
                    'excluded']
@@ -274,12 +331,11 @@ class ExtractorTest(Extractor):
         return df
 
 
-def get_extractors(endpoint: str, archivepoint: str, authentification_key: str, test_mode: bool) -> []:
-    if test_mode:
-        return [ExtractorTest('Compte De Test', endpoint, archivepoint)]
-    else:
-        return [ExtractorCreditAgricole(endpoint, archivepoint),
-                ExtractorBoursorama(endpoint, archivepoint),
-                ExtractorLiquide('Liquide Vincent', endpoint, archivepoint, authentification_key),
-                ExtractorLiquide('Liquide Aurélie', endpoint, archivepoint, authentification_key)]
+def get_extractors(endpoint: str, archivepoint: str, authentification_key: str, test_mode: bool,
+                   cache: StatementCache = None) -> []:
+    """ Creates the extractors of all the sources, whether they have new data or not
 
+    :param cache: the StatementCache of the parsed statement files, if any"""
+    from pyfin.registry import get_extractors as get_registered_extractors, ExtractorSettings
+    return get_registered_extractors(ExtractorSettings(endpoint, archivepoint, authentification_key, cache),
+                                     test_mode=test_mode, only_pending=False)
@@ -5,11 +5,16 @@ La logique est la suivante :
 - le renvoyer
 """
 from pathlib import Path
-import pandas as pd
 import datetime as dt
+from functools import lru_cache
+from typing import TYPE_CHECKING
 
-from sqlalchemy.engine import Engine
-from sqlalchemy import text
+# pandas, SQLAlchemy and odfpy are imported by the lookups needing them
+if TYPE_CHECKING:
+    import pandas as pd
+    from sqlalchemy.engine import Engine
+
+comptes_columns = ('N°', 'Date d\'insertion')
 
 
 def get_latest_file(folder: Path) -> Path:
@@ -21,9 +26,33 @@ def get_latest_file(folder: Path) -> Path:
         raise KeyError(f'could not find a file in folder {folder}')
 
 
+@lru_cache(maxsize=8)
+def read_comptes_columns(comptes_file: Path, mtime_ns: int, size: int, sheet_name: str) -> 'pd.DataFrame':
+    """ Reads the index and insertion date columns of the comptes in a single pass,
+    either from a CSV export or directly from the ODS workbook.
+    The modification time and the size are part of the cache key, so that a modified file is read again"""
+    if comptes_file.suffix.lower() == '.ods':
+        from pyfin.odsstream import read_columns_from_ods
+
+        # the sheet is scanned without building the document
+        return read_columns_from_ods(comptes_file, sheet_name, list(comptes_columns))
+    else:
+        import pandas as pd
+
+        return pd.read_csv(comptes_file, usecols=lambda c: c in comptes_columns)
+
+
+def load_comptes_columns(comptes_file: Path, sheet_name: str = 'Mouvements') -> 'pd.DataFrame':
+    """ Returns the index and insertion date columns of the comptes, read once per version of the file.
+    The caller gets its own copy, which it may modify without altering the cached columns"""
+    comptes_file = Path(comptes_file).resolve()
+    stat = comptes_file.stat()
+    return read_comptes_columns(comptes_file, stat.st_mtime_ns, stat.st_size, sheet_name).copy()
+
+
 def get_index_from_file(comptes_csv: Path) -> int:
-    # load the csv file
-    df = pd.read_csv(comptes_csv)
+    # load the columns of the csv file, or of the ods workbook
+    df = load_comptes_columns(comptes_csv)
     # search the index column
     try:
         s = df['N°']
@@ -32,15 +61,19 @@ def get_index_from_file(comptes_csv: Path) -> int:
 
     return int(s.max())
 
-def get_index_from_database(e: Engine, tablename: str) -> int:
+def get_index_from_database(e: 'Engine', tablename: str) -> int:
+    from sqlalchemy import text
+
     with e.connect() as conn:
         result = int(conn.scalar(text(f'SELECT MAX({tablename}."No") FROM {tablename} WHERE {tablename}."No" IS NOT NULL')))
         result += 1
     return result
 
 def get_lastdate_from_file(comptes_csv: Path) -> dt.date:
-    # load the csv file
-    df = pd.read_csv(comptes_csv)
+    import pandas as pd
+
+    # load the columns of the csv file, or of the ods workbook
+    df = load_comptes_columns(comptes_csv)
     # search the date column
     try:
         s = df['Date d\'insertion']
@@ -52,7 +85,9 @@ def get_lastdate_from_file(comptes_csv: Path) -> dt.date:
     s = s.fillna(dt.date(2000, 1, 1))
     return s.max()
 
-def get_lastdate_from_database(e: Engine, tablename: str) -> str:
+def get_lastdate_from_database(e: 'Engine', tablename: str) -> str:
+    from sqlalchemy import text
+
     with e.connect() as conn:
         result = conn.scalar(text(f'SELECT MAX({tablename}."Date insertion") FROM {tablename} where {tablename}."Date insertion" IS NOT NULL'))
     return result
\ No newline at end of file
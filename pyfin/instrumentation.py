@@ -0,0 +1,146 @@
+"""
+Module to measure the stages of the import pipeline.
+Each stage records its wall time, its CPU time, the rows it received and returned,
+and how much it raised the peak resident memory of the process. As that peak never goes down,
+a stage using less memory than an earlier one shows no rise.
+The records of a run are summarised as a table, and can be written as a JSON report.
+"""
+import sys
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from threading import Lock
+
+try:
+    import resource
+except ImportError:
+    # not available on Windows : the memory is not measured
+    resource = None
+
+
+def get_peak_memory() -> int:
+    """ Returns the peak resident memory of the process, in kilobytes"""
+    if resource is None:
+        return 0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # reported in bytes on macOS, in kilobytes elsewhere
+    return peak // 1024 if sys.platform == 'darwin' else peak
+
+
+def count_rows(value) -> int:
+    """ Returns the number of rows of a dataframe, or of a tuple of dataframes, None for anything else"""
+    if isinstance(value, tuple):
+        counts = [count_rows(v) for v in value]
+        return None if None in counts else sum(counts)
+    return len(value) if hasattr(value, 'columns') else None
+
+
+class StageRecord:
+    """ The measures of a stage"""
+
+    def __init__(self, name: str, group: str = '', rows_in: int = None):
+        self.name = name
+        self.group = group
+        self.rows_in = rows_in
+        self.rows_out = None
+        self.wall_time = 0.0
+        self.cpu_time = 0.0
+        self.peak_rss_rise = 0
+
+    def to_dict(self) -> dict:
+        return {'stage': self.name, 'group': self.group, 'rows_in': self.rows_in, 'rows_out': self.rows_out,
+                'wall_time': round(self.wall_time, 6), 'cpu_time': round(self.cpu_time, 6),
+                'peak_rss_rise_kb': self.peak_rss_rise}
+
+
+@contextmanager
+def measure(name: str, group: str = '', rows_in: int = None):
+    """ Measures the enclosed block, and yields its record so that the block can set the rows it returned.
+    The CPU time is the one of the whole process, including the other threads"""
+    record = StageRecord(name, group, rows_in)
+    memory = get_peak_memory()
+    cpu = time.process_time()
+    wall = time.perf_counter()
+    try:
+        yield record
+    finally:
+        record.wall_time = time.perf_counter() - wall
+        record.cpu_time = time.process_time() - cpu
+        record.peak_rss_rise = get_peak_memory() - memory
+
+
+class Instrumentation:
+    """ Collects the records of the stages of a run. Safe to use from several threads"""
+
+    def __init__(self):
+        self.__records__ = []
+        self.__lock__ = Lock()
+
+    def reset(self):
+        with self.__lock__:
+            self.__records__ = []
+
+    def add(self, record: StageRecord):
+        with self.__lock__:
+            self.__records__.append(record)
+
+    def get_records(self) -> list:
+        with self.__lock__:
+            return list(self.__records__)
+
+    @contextmanager
+    def stage(self, name: str, group: str = '', rows_in: int = None):
+        """ Measures and records the enclosed block.
+
+        :param name: the name of the stage
+        :param group: the extractor or account the stage runs for, if any
+        :param rows_in: the number of rows the stage receives"""
+        with measure(name, group, rows_in) as record:
+            try:
+                yield record
+            finally:
+                self.add(record)
+
+    def run(self, name: str, func, *args, group: str = '', **kwargs):
+        """ Runs a function as a stage. The rows in and out are counted on the first dataframe argument
+        and on the returned dataframes"""
+        rows_in = next((count_rows(a) for a in args if count_rows(a) is not None), None)
+        with self.stage(name, group, rows_in) as record:
+            result = func(*args, **kwargs)
+            record.rows_out = count_rows(result)
+        return result
+
+    def get_summary(self) -> str:
+        """ Returns the records as a table, with the total of the times"""
+        headers = ['stage', 'group', 'rows in', 'rows out', 'wall (s)', 'cpu (s)', 'peak rss rise (kB)']
+        rows = [[r.name, r.group, '' if r.rows_in is None else str(r.rows_in),
+                 '' if r.rows_out is None else str(r.rows_out),
+                 f'{r.wall_time:.3f}', f'{r.cpu_time:.3f}', str(r.peak_rss_rise)] for r in self.get_records()]
+        rows.append(['total', '', '', '', f'{sum(r.wall_time for r in self.get_records()):.3f}',
+                     f'{sum(r.cpu_time for r in self.get_records()):.3f}', ''])
+        widths = [max(len(row[i]) for row in rows + [headers]) for i in range(len(headers))]
+        lines = [' | '.join(v.ljust(w) if i < 2 else v.rjust(w) for i, (v, w) in enumerate(zip(row, widths)))
+                 for row in [headers] + rows]
+        lines.insert(1, '-+-'.join('-' * w for w in widths))
+        return '\n'.join(lines)
+
+    def write_report(self, report_file: Path, **metadata):
+        """ Writes the records as a JSON report, along with metadata describing the run"""
+        import json
+        with open(report_file, 'w', encoding='utf-8') as target:
+            json.dump(metadata | {'stages': [r.to_dict() for r in self.get_records()]}, target,
+                      ensure_ascii=False, indent=2, default=str)
+
+
+# the instrumentation of the current run
+instrumentation = Instrumentation()
+
+
+def stage(name: str, group: str = '', rows_in: int = None):
+    """ Measures and records the enclosed block in the instrumentation of the run"""
+    return instrumentation.stage(name, group, rows_in)
+
+
+def run_stage(name: str, func, *args, group: str = '', **kwargs):
+    """ Runs a function as a stage of the run"""
+    return instrumentation.run(name, func, *args, group=group, **kwargs)
@@ -3,16 +3,151 @@ Module to handle the standard logging output
 a log entry is interesting if it indicates from which module it was executed
 generally we should have two possibilities :
 - generate a section
-- generate a log ery
+- generate a log entry
+
+The entries go through the standard logging, under the 'pyfin' logger, one child logger per module.
+The messages take lazy %-style arguments, so that an entry below the configured level costs no formatting.
+Once configured, the entries are handed to a queue and written by a background thread.
+The entries of the worker processes are put into a multiprocessing queue, and logged again in the parent process.
 """
+import logging
+from contextlib import contextmanager
+from functools import lru_cache
 from pathlib import Path
 
-def write_log_section(section_name: str):
-    print('*** ' + section_name + ' ***')
+root_logger_name = 'pyfin'
+__listener__ = None
+
+
+@lru_cache(maxsize=None)
+def get_logger(context: str) -> logging.Logger:
+    """ Returns the logger of a module, from its file name"""
+    return logging.getLogger(f'{root_logger_name}.{Path(context).stem}')
+
+
+def write_log_section(section_name: str, *args, level: int = logging.INFO):
+    logging.getLogger(root_logger_name).log(level, '*** ' + section_name + ' ***', *args)
+
+
+def write_log_entry(context: str, event: str, *args, level: int = logging.INFO):
+    """ Logs an event of a module
+
+    :param context: the file of the module
+    :param event: the message, with %-style placeholders for the args
+    :param level: the logging level"""
+    get_logger(context).log(level, event, *args)
+
+
+def write_line(level: int = logging.INFO):
+    logging.getLogger(root_logger_name).log(level, '')
+
+
+def is_enabled(context: str, level: int) -> bool:
+    """ True if the entries of the level are written, to skip the preparation of the suppressed ones"""
+    return get_logger(context).isEnabledFor(level)
+
+
+class ContextFormatter(logging.Formatter):
+    """ Formats an entry as 'module | message', and a section as the message alone"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        message = record.getMessage()
+        if record.name == root_logger_name:
+            return message
+        return record.name.rsplit('.', 1)[-1] + ' | ' + message
+
+
+class JsonLinesFormatter(logging.Formatter):
+    """ Formats an entry as a JSON object on a single line"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        import json
+        return json.dumps({'time': self.formatTime(record, '%Y-%m-%dT%H:%M:%S'),
+                           'level': record.levelname,
+                           'context': record.name.rsplit('.', 1)[-1],
+                           'message': record.getMessage()}, ensure_ascii=False)
+
+
+def configure_logging(level: str = 'INFO', json_file: Path = None, stream=None):
+    """ Sets the level of the entries and starts writing them from a background thread
+
+    :param level: the name of the minimum level written : DEBUG, INFO, WARNING, ERROR
+    :param json_file: a file to which the entries are also appended as JSON lines, if any
+    :param stream: the stream of the text entries, the standard output by default"""
+    global __listener__
+    import atexit
+    import queue
+    import sys
+    from logging.handlers import QueueHandler, QueueListener
+
+    shutdown_logging()
+    handlers = []
+    text_handler = logging.StreamHandler(sys.stdout if stream is None else stream)
+    text_handler.setFormatter(ContextFormatter())
+    handlers.append(text_handler)
+    if json_file is not None:
+        json_handler = logging.FileHandler(json_file, encoding='utf-8')
+        json_handler.setFormatter(JsonLinesFormatter())
+        handlers.append(json_handler)
+
+    records = queue.SimpleQueue()
+    logger = logging.getLogger(root_logger_name)
+    logger.handlers = [QueueHandler(records)]
+    logger.setLevel(level.upper() if isinstance(level, str) else level)
+    logger.propagate = False
+    __listener__ = QueueListener(records, *handlers)
+    __listener__.start()
+    atexit.unregister(shutdown_logging)
+    atexit.register(shutdown_logging)
+
+
+def shutdown_logging():
+    """ Writes the pending entries and stops the background thread"""
+    global __listener__
+    if __listener__ is not None:
+        __listener__.stop()
+        for h in __listener__.handlers:
+            h.close()
+        __listener__ = None
+
+
+class ForwardHandler(logging.Handler):
+    """ Logs again, in this process, the entries received from the worker processes"""
+
+    def emit(self, record: logging.LogRecord):
+        logger = logging.getLogger(record.name)
+        if logger.isEnabledFor(record.levelno):
+            logger.handle(record)
+
+
+@contextmanager
+def forward_worker_logs(context):
+    """ Yields a queue of the multiprocessing context, into which the worker processes put their entries
+    (see configure_worker_logging). The entries are logged again in this process until the block exits,
+    so the block must wait for the workers before it exits
+
+    :param context: the multiprocessing context of the workers"""
+    from logging.handlers import QueueListener
+
+    records = context.Queue()
+    listener = QueueListener(records, ForwardHandler())
+    listener.start()
+    try:
+        yield records
+    finally:
+        listener.stop()
+        records.close()
+        records.join_thread()
+
+
+def configure_worker_logging(records, level: int):
+    """ Initializer of a worker process : its entries are put into the queue of the parent process
 
-def write_log_entry(context: str, event: str):
-    p = Path(context)
-    print(p.stem + ' | ' + event)
+    :param records: the queue yielded by forward_worker_logs
+    :param level: the minimum level of the entries"""
+    from logging.handlers import QueueHandler
 
-def write_line():
-    print('')
+    logger = logging.getLogger(root_logger_name)
+    logger.handlers = [QueueHandler(records)]
+    logger.setLevel(level)
+    logger.propagate = False
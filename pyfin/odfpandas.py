@@ -4,6 +4,7 @@ from odf.element import Element
 from odf.table import Table
 from odf.table import TableRow
 from odf.table import TableCell
+from odf.namespaces import TABLENS
 from odf.text import P
 from pathlib import Path
 import datetime as dt
@@ -59,6 +60,35 @@ def generate_table_cell_datetime(content: dt.datetime, stylename: str = '', rule
     return result
 
 
+def get_column_kind(dtype) -> str:
+    """ Returns the kind of cell to generate for a column type : float, integer, datetime or text"""
+    if dtype == 'float64':
+        return 'float'
+    elif dtype == 'int64':
+        return 'integer'
+    elif dtype == r'datetime64[ns]':
+        return 'datetime'
+    else:
+        return 'text'
+
+
+cell_generators = {'float': generate_table_cell_float,
+                   'integer': generate_table_cell_integer,
+                   'datetime': generate_table_cell_datetime,
+                   'text': generate_table_cell_text}
+
+
+def get_cell_runs(styles: list, rules: list) -> list:
+    """ Groups consecutive identical (style, rule) pairs into a list of (style, rule, count)"""
+    runs = []
+    for pair in zip(styles, rules):
+        if len(runs) > 0 and runs[-1][:2] == pair:
+            runs[-1] = (pair[0], pair[1], runs[-1][2] + 1)
+        else:
+            runs.append((pair[0], pair[1], 1))
+    return runs
+
+
 def get_cell_column_span(cell: Element) -> int:
     try:
         span = cell.getAttribute('numbercolumnsrepeated')
@@ -77,11 +107,71 @@ def get_cell_validation(elt: Element) -> str:
     return '' if rule is None else rule
 
 
+cell_qname = (TABLENS, 'table-cell')
+covered_cell_qname = (TABLENS, 'covered-table-cell')
+
+
+def get_row_span(row: Element) -> int:
+    try:
+        span = row.getAttribute('numberrowsrepeated')
+        return 1 if span is None else int(span)
+    except ValueError:
+        return 1
+
+
+def get_cell_value(cell: Element):
+    """ Returns the value of a cell, converted from its typed attributes : float, timestamp, boolean or text.
+    An empty cell returns None"""
+    value_type = cell.getAttribute('valuetype')
+    if value_type in ('float', 'currency', 'percentage'):
+        return float(cell.getAttribute('value'))
+    elif value_type == 'date':
+        return pd.Timestamp(cell.getAttribute('datevalue'))
+    elif value_type == 'boolean':
+        return cell.getAttribute('booleanvalue') == 'true'
+    elif value_type == 'time':
+        return pd.Timedelta(cell.getAttribute('timevalue'))
+    paragraphs = cell.getElementsByType(P)
+    return '\n'.join(str(p) for p in paragraphs) if len(paragraphs) > 0 else None
+
+
+def get_row_values(row: Element, positions: set = None) -> dict:
+    """ Returns the values of a row by column position, expanding the repeated cells.
+    Only the non-empty cells are returned, restricted to the given positions if any"""
+    result = {}
+    last = None if positions is None else max(positions, default=-1)
+    position = 0
+    for cell in row.childNodes:
+        qname = getattr(cell, 'qname', None)
+        if qname not in (cell_qname, covered_cell_qname):
+            continue
+        span = get_cell_column_span(cell)
+        value = None if qname == covered_cell_qname else get_cell_value(cell)
+        if value is not None:
+            for i in range(position, position + span):
+                if positions is None or i in positions:
+                    result[i] = value
+        position += span
+        if last is not None and position > last:
+            break
+    return result
+
+
+def expand_row_cells(row: Element) -> list:
+    """ Returns the cells of a row, each cell being repeated as many times as the columns it spans"""
+    result = []
+    for c in row.getElementsByType(TableCell):
+        result += [c] * get_cell_column_span(c)
+    return result
+
+
 class RowWrapper:
     __element__: Element
+    __cells__: list
 
     def __init__(self, stylename: str = ''):
         self.__element__ = TableRow()
+        self.__cells__ = None
         if stylename == '':
             self.__element__.setAttribute('stylename', stylename)
 
@@ -92,51 +182,87 @@ class RowWrapper:
     @element.setter
     def element(self, elt: Element):
         self.__element__ = elt
+        self.__cells__ = None
+
+    def invalidate(self):
+        """ Forgets the cell index, to be called when the cells of the row were modified"""
+        self.__cells__ = None
+
+    def get_cells(self) -> list:
+        """ Returns the cells of the row, expanded over the repeated columns"""
+        if self.__cells__ is None:
+            self.__cells__ = expand_row_cells(self.__element__)
+        return self.__cells__
 
     def get_cell_count(self) -> int:
-        result = 0
-        for c in self.__element__.getElementsByType(TableCell):
-            result += get_cell_column_span(c)
-        return result
+        return len(self.get_cells())
 
     def get_cell_style(self, index: int) -> str:
-        max_index = 0
-        for c in self.__element__.getElementsByType(TableCell):
-            max_index += get_cell_column_span(c)
-            if index < max_index:
-                if get_element_style(c) == '':
-                    return get_element_style(self.__element__)
-                else:
-                    return get_element_style(c)
+        cells = self.get_cells()
+        if index < len(cells):
+            if get_element_style(cells[index]) == '':
+                return get_element_style(self.__element__)
+            else:
+                return get_element_style(cells[index])
 
     def get_cell_validation(self, index: int) -> str:
-        max_index = 0
-        for c in self.__element__.getElementsByType(TableCell):
-            max_index += get_cell_column_span(c)
-            if index < max_index:
-                return get_cell_validation(c)
+        cells = self.get_cells()
+        if index < len(cells):
+            return get_cell_validation(cells[index])
 
 
 class SheetWrapper:
     __sheet__: Table
+    __rows__: list
+    __first_empty_row__: int
+    __cells__: dict
 
     def __init__(self, value: Table):
         self.__sheet__ = value
+        self.invalidate()
 
     @property
     def name(self) -> str:
         return self.__sheet__.getAttribute('name')
 
+    def invalidate(self):
+        """ Forgets the row and cell indexes, to be called when the sheet was modified outside the wrapper"""
+        self.__rows__ = None
+        self.__first_empty_row__ = None
+        self.__cells__ = {}
+
+    def get_rows(self) -> list:
+        """ Returns the rows of the sheet. The list is built once, then kept up to date by the insertions"""
+        if self.__rows__ is None:
+            self.__rows__ = self.__sheet__.getElementsByType(TableRow)
+        return self.__rows__
+
     def get_row_count(self) -> int:
         """ Returns the total number of rows in the sheet"""
-        return len(self.__sheet__.getElementsByType(TableRow))
+        return len(self.get_rows())
+
+    def get_first_empty_row(self) -> int:
+        """ Returns the position of the first empty row, or -1 if all the rows are filled"""
+        if self.__first_empty_row__ is None:
+            self.__first_empty_row__ = next((i for i, r in enumerate(self.get_rows()) if self.is_row_empty(r)), -1)
+        return self.__first_empty_row__
+
+    def get_row_cells(self, index: int) -> list:
+        """ Returns the cells of a row, expanded over the repeated columns"""
+        row = self.get_row(index)
+        cells = self.__cells__.get(row)
+        if cells is None:
+            cells = expand_row_cells(row)
+            self.__cells__[row] = cells
+        return cells
 
     def get_cell(self, row_index: int, col_index: int) -> Element:
         """ Access a specific cell
-        :returns: """
+        :returns: the cell element. A repeated cell is returned for each of the columns it spans"""
+        return self.get_row_cells(row_index)[col_index]
 
     def get_row(self, index: int) -> Element:
-        return self.__sheet__.getElementsByType(TableRow)[index]
+        return self.get_rows()[index]
 
     def is_row_empty(self, row: Element) -> bool:
         analysis = [c.hasChildNodes() for c in row.childNodes]
@@ -154,6 +280,7 @@ class SheetWrapper:
                     row.addElement(generate_table_cell_text(str(value)))
             # add the row to the table
             self.__sheet__.addElement(row)
+        self.invalidate()
 
     def insert_from_dataframe(self, df: pd.DataFrame, include_headers: bool = False, mode: str = 'overwrite'):
         """ inserts a pandas dataframe into the sheet.
@@ -165,52 +292,64 @@ class SheetWrapper:
             'append' : finds the first empty row and then appends."""
 
         empty_row = None
+        position = -1
         if mode == 'overwrite':
             # delete all the rows
-            rows = self.__sheet__.getElementsByType(TableRow)
-            for r in rows:
-                self.__sheet__.removeChild(r)
+            for r in self.get_rows():
+                r.parentNode.removeChild(r)
+            self.__rows__ = []
+            self.__first_empty_row__ = -1
+            self.__cells__ = {}
         elif mode == 'append':
             # find the first empty row
-            rows = self.__sheet__.getElementsByType(TableRow)
-            for r in rows:
-                if self.is_row_empty(r):
-                    empty_row = RowWrapper()
-                    empty_row.element = r
-                    break
+            position = self.get_first_empty_row()
+            if position >= 0:
+                empty_row = self.get_row(position)
+
+        # the new rows are inserted before the empty row, or at the end of the sheet
+        parent = self.__sheet__ if empty_row is None else empty_row.parentNode
+
+        # the styles and validation rules of the empty row are resolved once
+        styles = [] if empty_row is None else self.get_row_style_array(empty_row)
+        rules = [] if empty_row is None else self.get_row_validation_array(empty_row)
+        column_count = len(df.columns)
+        styles += [''] * (column_count - len(styles))
+        rules += [''] * (column_count - len(rules))
+        # if there are extra styles, empty cells are created, grouped when identical
+        trailing = get_cell_runs(styles[column_count:], rules[column_count:])
 
         # create the headers
+        new_rows = []
         if include_headers:
             row = TableRow()
             for c in df.columns:
                 row.addElement(generate_table_cell_text(c))
-            self.__sheet__.insertBefore(row, empty_row)
+            parent.insertBefore(row, empty_row)
+            new_rows.append(row)
 
-        # import the values
-        for i in range(len(df)):
+        # import the values, column by column
+        generators = [cell_generators[get_column_kind(t)] for t in df.dtypes]
+        columns = [df.iloc[:, j].tolist() for j in range(column_count)]
+        for values in zip(*columns):
             row = TableRow()
-            for j in range(len(df.columns)):
-                value = df.iloc[i, j]
-                t = df.dtypes[j]
-                style = empty_row.get_cell_style(j)
-                rule = empty_row.get_cell_validation(j)
-                if t == 'float64':
-                    row.addElement(generate_table_cell_float(value, style, rule))
-                elif t == 'int64':
-                    row.addElement(generate_table_cell_integer(value, style, rule))
-                elif t == r'datetime64[ns]':
-                    row.addElement(generate_table_cell_datetime(value, style, rule))
-                else:
-                    row.addElement(generate_table_cell_text(value, style, rule))
-
-            # if there are extra styles, create empty cells
-            if empty_row.get_cell_count() > len(df.columns):
-                for j in range(len(df.columns), empty_row.get_cell_count()):
-                    row.addElement(generate_cell_empty(empty_row.get_cell_style(j),
-                                                       empty_row.get_cell_validation(j)))
+            for j, value in enumerate(values):
+                row.addElement(generators[j](value, styles[j], rules[j]))
+            for style, rule, count in trailing:
+                cell = generate_cell_empty(style, rule)
+                if count > 1:
+                    cell.setAttribute('numbercolumnsrepeated', str(count))
+                row.addElement(cell)
 
             # add the row to the table
-            self.__sheet__.insertBefore(row, empty_row.element)
+            parent.insertBefore(row, empty_row)
+            new_rows.append(row)
+
+        # keep the row index up to date, the new rows come before the empty row
+        if position >= 0:
+            self.__rows__[position:position] = new_rows
+            self.__first_empty_row__ = position + len(new_rows)
+        elif self.__rows__ is not None:
+            self.__rows__ += new_rows
 
     def get_row_style_array(self, row: Element) -> list:
         """ Function that analyzes a row and returns an array of style names.
@@ -227,16 +366,83 @@ class SheetWrapper:
             result += [style] * span
         return result
 
+    def get_row_validation_array(self, row: Element) -> list:
+        """ Function that analyzes a row and returns an array of validation rules.
+        There are as many rules as there are cells"""
+        cell: Element
+        result = []
+        for cell in row.getElementsByType(TableCell):
+            result += [get_cell_validation(cell)] * get_cell_column_span(cell)
+        return result
+
+    def to_dataframe(self, columns: list = None, usecols: list = None, nrows: int = None,
+                     header: bool = True) -> pd.DataFrame:
+        """ Reads the sheet into a dataframe. The repeated rows and cells are expanded as they are read,
+        and the trailing empty rows and columns are ignored.
+
+        :param columns: the names to give to the columns, instead of the header
+        :param usecols: the columns to read, as header names or positions
+        :param nrows: the maximum number of data rows to read
+        :param header: True if the first row holds the column names"""
+        rows = iter(self.get_rows())
+        names = {}
+        if header:
+            first = next(rows, None)
+            names = {} if first is None else get_row_values(first)
+
+        # resolve the positions to read
+        positions = None
+        if usecols is not None:
+            by_name = {str(v): k for k, v in sorted(names.items(), reverse=True)}
+            positions = []
+            for c in usecols:
+                if isinstance(c, int):
+                    positions.append(c)
+                elif c in by_name:
+                    positions.append(by_name[c])
+                else:
+                    raise KeyError(f'column {c} not found in the sheet {self.name}')
+
+        data = []
+        empty_rows = 0
+        selection = None if positions is None else set(positions)
+        for row in rows:
+            if nrows is not None and len(data) >= nrows:
+                break
+            values = get_row_values(row, selection)
+            span = get_row_span(row)
+            if len(values) == 0:
+                # empty rows are only kept when followed by values
+                empty_rows += span
+                continue
+            data += [{}] * empty_rows
+            data += [values] * span
+            empty_rows = 0
+        if nrows is not None:
+            data = data[:nrows]
+
+        if positions is None:
+            width = max([max(v) + 1 for v in data] + [max(names) + 1 if len(names) > 0 else 0])
+            positions = list(range(width))
+        result = pd.DataFrame([[values.get(i) for i in positions] for values in data], columns=range(len(positions)))
+        if columns is not None:
+            result.columns = columns
+        elif header:
+            result.columns = [str(names[i]) if i in names else f'Unnamed: {i}' for i in positions]
+        return result
+
 
 class SpreadsheetWrapper:
     __workbook__: OpenDocumentSpreadsheet
-    __sheets__ = {}
+    __sheets__: dict
 
     def __init__(self):
         self.__workbook__ = OpenDocumentSpreadsheet()
+        self.__sheets__ = {}
 
     def load(self, filepath: Path):
         self.__workbook__ = load(filepath)
+        self.__sheets__ = {}
         for t in self.__workbook__.getElementsByType(Table):
             sheet = SheetWrapper(t)
             self.__sheets__[sheet.name] = sheet
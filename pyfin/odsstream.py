@@ -0,0 +1,409 @@
+"""
+Module to append rows to an ODS workbook, or read some of its columns, without loading it.
+The content.xml part is parsed incrementally until the first empty row of the target sheet,
+the new rows are spliced in at that position while the bytes are copied through,
+and the other parts of the archive, which are small, are copied as they are.
+The columns are read in the same way, down to the end of the sheet.
+"""
+import os
+import shutil
+import tempfile
+import zipfile
+from pathlib import Path
+from xml.parsers import expat
+from xml.sax.saxutils import escape, quoteattr
+
+import pandas as pd
+
+from pyfin.odfpandas import get_column_kind, get_cell_runs
+
+TABLE_NS = 'urn:oasis:names:tc:opendocument:xmlns:table:1.0'
+OFFICE_NS = 'urn:oasis:names:tc:opendocument:xmlns:office:1.0'
+TEXT_NS = 'urn:oasis:names:tc:opendocument:xmlns:text:1.0'
+CONTENT = 'content.xml'
+CHUNK_SIZE = 64 * 1024
+
+
+class _InsertionPointFound(Exception):
+    """ Raised to stop the parsing once the insertion point is known"""
+
+
+class _SheetRead(Exception):
+    """ Raised to stop the parsing at the end of the sheet"""
+
+
+def parse_until(parser, stream, stop: type) -> bool:
+    """ Feeds the stream to the parser until one of its handlers raises the stop exception.
+
+    :returns: True if the parsing was stopped, False if the whole stream was parsed"""
+    try:
+        while True:
+            chunk = stream.read(CHUNK_SIZE)
+            parser.Parse(chunk, len(chunk) == 0)
+            if len(chunk) == 0:
+                return False
+    except stop:
+        return True
+
+
+class SheetScanner:
+    """ Scans a content.xml stream to find where the rows of a sheet should be inserted.
+
+    After the scan, offset is the byte position of the first empty row of the sheet,
+    or the one following its last row when there is no empty row, and styles / rules describe the cells of that row."""
+    offset: int
+    styles: list
+    rules: list
+    prefixes: dict
+
+    def __init__(self, sheet_name: str):
+        self.__sheet_name__ = sheet_name
+        self.__parser__ = expat.ParserCreate(namespace_separator=' ')
+        self.__parser__.StartNamespaceDeclHandler = self.__start_namespace__
+        self.__parser__.StartElementHandler = self.__start_element__
+        self.__parser__.EndElementHandler = self.__end_element__
+        self.__parser__.CharacterDataHandler = self.__character_data__
+        self.__depth__ = 0
+        self.__sheet_depth__ = None
+        self.__row_depth__ = None
+        self.__row_offset__ = 0
+        self.__row_style__ = ''
+        self.__row_has_content__ = False
+        self.__row_ended__ = False
+        self.__last_row_end__ = None
+        self.offset = None
+        self.styles = []
+        self.rules = []
+        self.prefixes = {TABLE_NS: 'table', OFFICE_NS: 'office', TEXT_NS: 'text'}
+
+    def __start_namespace__(self, prefix: str, uri: str):
+        if uri in self.prefixes and prefix is not None:
+            self.prefixes[uri] = prefix
+
+    def __mark_row_end__(self):
+        # the event following a row starts right after its end tag
+        if self.__row_ended__:
+            self.__last_row_end__ = self.__parser__.CurrentByteIndex
+            self.__row_ended__ = False
+
+    def __start_element__(self, name: str, attributes: dict):
+        self.__mark_row_end__()
+        self.__depth__ += 1
+        if name == f'{TABLE_NS} table' and self.__sheet_depth__ is None:
+            if attributes.get(f'{TABLE_NS} name') == self.__sheet_name__:
+                self.__sheet_depth__ = self.__depth__
+        elif self.__sheet_depth__ is None:
+            return
+        elif name == f'{TABLE_NS} table-row' and self.__row_depth__ is None:
+            self.__row_depth__ = self.__depth__
+            self.__row_offset__ = self.__parser__.CurrentByteIndex
+            self.__row_style__ = attributes.get(f'{TABLE_NS} style-name', '')
+            self.__row_has_content__ = False
+            self.styles = []
+            self.rules = []
+        elif self.__row_depth__ is None:
+            return
+        elif self.__depth__ == self.__row_depth__ + 1:
+            if name == f'{TABLE_NS} table-cell':
+                try:
+                    span = int(attributes.get(f'{TABLE_NS} number-columns-repeated', '1'))
+                except ValueError:
+                    span = 1
+                style = attributes.get(f'{TABLE_NS} style-name', self.__row_style__)
+                self.styles += [style] * span
+                self.rules += [attributes.get(f'{TABLE_NS} content-validation-name', '')] * span
+        else:
+            # an element inside a cell
+            self.__row_has_content__ = True
+
+    def __end_element__(self, name: str):
+        self.__mark_row_end__()
+        if self.__row_depth__ == self.__depth__:
+            self.__row_depth__ = None
+            if not self.__row_has_content__:
+                self.offset = self.__row_offset__
+                raise _InsertionPointFound()
+            self.__row_ended__ = True
+        elif self.__sheet_depth__ == self.__depth__:
+            # no empty row, the rows are added after the last one, before the named expressions or filters
+            # which may close the sheet
+            if self.__last_row_end__ is not None:
+                self.offset = self.__last_row_end__
+            else:
+                self.offset = self.__parser__.CurrentByteIndex
+            self.styles = []
+            self.rules = []
+            raise _InsertionPointFound()
+        self.__depth__ -= 1
+
+    def __character_data__(self, data: str):
+        self.__mark_row_end__()
+        if self.__row_depth__ is not None and self.__depth__ > self.__row_depth__:
+            self.__row_has_content__ = True
+
+    def scan(self, stream) -> bool:
+        """ Feeds the stream to the parser until the insertion point is found.
+
+        :returns: True if the sheet was found"""
+        return parse_until(self.__parser__, stream, _InsertionPointFound)
+
+
+def get_span(attributes: dict, name: str) -> int:
+    try:
+        return int(attributes.get(f'{TABLE_NS} {name}', '1'))
+    except ValueError:
+        return 1
+
+
+def convert_cell_value(attributes: dict, paragraphs: list):
+    """ Returns the value of a cell from its attributes and the text of its paragraphs,
+    as odfpandas.get_cell_value does. An empty cell returns None"""
+    value_type = attributes.get(f'{OFFICE_NS} value-type')
+    if value_type in ('float', 'currency', 'percentage'):
+        return float(attributes.get(f'{OFFICE_NS} value'))
+    elif value_type == 'date':
+        return pd.Timestamp(attributes.get(f'{OFFICE_NS} date-value'))
+    elif value_type == 'boolean':
+        return attributes.get(f'{OFFICE_NS} boolean-value') == 'true'
+    elif value_type == 'time':
+        return pd.Timedelta(attributes.get(f'{OFFICE_NS} time-value'))
+    return '\n'.join(paragraphs) if len(paragraphs) > 0 else None
+
+
+class ColumnReader:
+    """ Reads some columns of a sheet from a content.xml stream. The first row of the sheet holds the column names.
+
+    After the scan, rows holds the values of each row by column position, and positions the position
+    of each column found. As SheetWrapper.to_dataframe does, the repeated rows are expanded,
+    and the empty rows are only kept when followed by values"""
+    rows: list
+    positions: dict
+
+    def __init__(self, sheet_name: str, columns: list):
+        self.__sheet_name__ = sheet_name
+        self.__columns__ = columns
+        self.__parser__ = expat.ParserCreate(namespace_separator=' ')
+        self.__parser__.StartElementHandler = self.__start_element__
+        self.__parser__.EndElementHandler = self.__end_element__
+        self.__parser__.CharacterDataHandler = self.__character_data__
+        self.__depth__ = 0
+        self.__sheet_depth__ = None
+        self.__row_depth__ = None
+        self.__row_span__ = 1
+        self.__row_values__ = {}
+        self.__position__ = 0
+        self.__cell__ = None
+        self.__paragraphs__ = None
+        self.__in_paragraph__ = False
+        self.__empty_rows__ = 0
+        self.__selection__ = None
+        self.rows = []
+        self.positions = None
+
+    def __start_element__(self, name: str, attributes: dict):
+        self.__depth__ += 1
+        if name == f'{TABLE_NS} table' and self.__sheet_depth__ is None:
+            if attributes.get(f'{TABLE_NS} name') == self.__sheet_name__:
+                self.__sheet_depth__ = self.__depth__
+        elif self.__sheet_depth__ is None:
+            return
+        elif name == f'{TABLE_NS} table-row' and self.__row_depth__ is None:
+            self.__row_depth__ = self.__depth__
+            self.__row_span__ = get_span(attributes, 'number-rows-repeated')
+            self.__row_values__ = {}
+            self.__position__ = 0
+        elif self.__row_depth__ is None:
+            return
+        elif self.__depth__ == self.__row_depth__ + 1:
+            if name in (f'{TABLE_NS} table-cell', f'{TABLE_NS} covered-table-cell'):
+                self.__cell__ = (name, attributes)
+                self.__paragraphs__ = []
+        elif self.__cell__ is not None and name == f'{TEXT_NS} p' and self.__depth__ == self.__row_depth__ + 2:
+            self.__paragraphs__.append('')
+            self.__in_paragraph__ = True
+
+    def __end_element__(self, name: str):
+        if self.__sheet_depth__ is None:
+            pass
+        elif self.__in_paragraph__ and name == f'{TEXT_NS} p' and self.__depth__ == self.__row_depth__ + 2:
+            self.__in_paragraph__ = False
+        elif self.__row_depth__ is not None and self.__depth__ == self.__row_depth__ + 1 and self.__cell__ is not None:
+            self.__end_cell__()
+        elif self.__row_depth__ == self.__depth__:
+            self.__row_depth__ = None
+            self.__end_row__()
+        elif self.__sheet_depth__ == self.__depth__:
+            raise _SheetRead()
+        self.__depth__ -= 1
+
+    def __end_cell__(self):
+        cell_name, attributes = self.__cell__
+        span = get_span(attributes, 'number-columns-repeated')
+        positions = range(self.__position__, self.__position__ + span)
+        # only the cells of the selected columns are converted, all of them in the header
+        if cell_name == f'{TABLE_NS} table-cell' and \
+                (self.__selection__ is None or any(p in self.__selection__ for p in positions)):
+            value = convert_cell_value(attributes, self.__paragraphs__)
+            if value is not None:
+                for p in positions:
+                    if self.__selection__ is None or p in self.__selection__:
+                        self.__row_values__[p] = value
+        self.__position__ += span
+        self.__cell__ = None
+
+    def __end_row__(self):
+        if self.positions is None:
+            # the header : the first column of each name is read
+            names = {}
+            for p, value in sorted(self.__row_values__.items(), reverse=True):
+                names[str(value)] = p
+            self.positions = {c: names[c] for c in self.__columns__ if c in names}
+            self.__selection__ = set(self.positions.values())
+        elif len(self.__row_values__) == 0:
+            self.__empty_rows__ += self.__row_span__
+        else:
+            self.rows += [{}] * self.__empty_rows__
+            self.rows += [self.__row_values__] * self.__row_span__
+            self.__empty_rows__ = 0
+
+    def __character_data__(self, data: str):
+        if self.__in_paragraph__:
+            self.__paragraphs__[-1] += data
+
+    def scan(self, stream) -> bool:
+        """ Feeds the stream to the parser until the end of the sheet.
+
+        :returns: True if the sheet was found"""
+        return parse_until(self.__parser__, stream, _SheetRead) or self.__sheet_depth__ is not None
+
+
+def read_columns_from_ods(odsfile: Path, sheet_name: str, columns: list) -> pd.DataFrame:
+    """ Reads some columns of a sheet of an ODS workbook, without loading it.
+    Only content.xml is parsed, down to the end of the sheet.
+
+    :param odsfile: the workbook
+    :param sheet_name: the name of the sheet, whose first row holds the column names
+    :param columns: the names of the columns to read. The columns missing from the sheet are left out"""
+    reader = ColumnReader(sheet_name, columns)
+    with zipfile.ZipFile(odsfile) as zin, zin.open(CONTENT) as stream:
+        if not reader.scan(stream):
+            raise KeyError(f'sheet {sheet_name} not found in the workbook')
+    positions = reader.positions if reader.positions is not None else {}
+    return pd.DataFrame([[values.get(p) for p in positions.values()] for values in reader.rows],
+                        columns=list(positions))
+
+
+class RowFormatter:
+    """ Formats the rows of a dataframe as ODS xml, with the prefixes and template of the target sheet"""
+
+    def __init__(self, prefixes: dict, styles: list, rules: list, column_count: int):
+        self.__table__ = prefixes[TABLE_NS]
+        self.__office__ = prefixes[OFFICE_NS]
+        self.__text__ = prefixes[TEXT_NS]
+        self.__styles__ = styles + [''] * (column_count - len(styles))
+        self.__rules__ = rules + [''] * (column_count - len(rules))
+        # if there are extra styles, empty cells are created, grouped when identical
+        self.__trailing__ = ''.join(self.format_empty_cell(style, rule, count) for style, rule, count in
+                                    get_cell_runs(self.__styles__[column_count:], self.__rules__[column_count:]))
+        self.__formatters__ = {'float': self.format_float,
+                               'integer': self.format_float,
+                               'datetime': self.format_datetime,
+                               'text': self.format_text}
+
+    def format_attributes(self, style: str, rule: str) -> str:
+        result = ''
+        if style != '':
+            result += f' {self.__table__}:style-name={quoteattr(style)}'
+        if rule != '':
+            result += f' {self.__table__}:content-validation-name={quoteattr(rule)}'
+        return result
+
+    def format_empty_cell(self, style: str, rule: str, count: int = 1) -> str:
+        repeated = f' {self.__table__}:number-columns-repeated="{count}"' if count > 1 else ''
+        return f'<{self.__table__}:table-cell{self.format_attributes(style, rule)}{repeated}/>'
+
+    def format_cell(self, value_type: str, value_attribute: str, text: str, style: str, rule: str) -> str:
+        return (f'<{self.__table__}:table-cell {self.__office__}:value-type="{value_type}"{value_attribute}'
+                f'{self.format_attributes(style, rule)}>'
+                f'<{self.__text__}:p>{escape(text)}</{self.__text__}:p></{self.__table__}:table-cell>')
+
+    def format_float(self, value, style: str, rule: str) -> str:
+        return self.format_cell('float', f' {self.__office__}:value="{value}"', str(value), style, rule)
+
+    def format_datetime(self, value, style: str, rule: str) -> str:
+        if value.hour + value.minute + value.second == 0:
+            text = value.strftime('%d/%m/%Y')
+        else:
+            text = value.strftime('%d/%m/%Y %H:%M')
+        return self.format_cell('date', f' {self.__office__}:date-value="{value.strftime("%Y-%m-%dT%H:%M:%S")}"',
+                                text, style, rule)
+
+    def format_text(self, value, style: str, rule: str) -> str:
+        # as odfpy writes the text nodes : the falsy values (None, False, 0, '') give an empty paragraph
+        return self.format_cell('string', '', str(value) if value else '', style, rule)
+
+    def format_row(self, cells: list) -> str:
+        return f'<{self.__table__}:table-row>{"".join(cells)}{self.__trailing__}</{self.__table__}:table-row>'
+
+    def format_frame(self, df: pd.DataFrame, include_headers: bool = False):
+        """ Generates the xml of the rows, one row at a time"""
+        if include_headers:
+            yield self.format_row([self.format_text(c, '', '') for c in df.columns])
+        formatters = [self.__formatters__[get_column_kind(t)] for t in df.dtypes]
+        columns = [df.iloc[:, j].tolist() for j in range(len(df.columns))]
+        for values in zip(*columns):
+            yield self.format_row([formatters[j](value, self.__styles__[j], self.__rules__[j])
+                                   for j, value in enumerate(values)])
+
+
+def copy_entry(zin: zipfile.ZipFile, zout: zipfile.ZipFile, info: zipfile.ZipInfo):
+    """ Copies an archive entry as is : same name, date, compression and attributes.
+    The entry is rewritten from a fresh header, whatever the data descriptors and extra fields of the source"""
+    target = zipfile.ZipInfo(info.filename, date_time=info.date_time)
+    target.compress_type = info.compress_type
+    target.external_attr = info.external_attr
+    target.comment = info.comment
+    zout.writestr(target, zin.read(info))
+
+
+def append_frame_to_ods(df: pd.DataFrame, odsfile: Path, sheet_name: str, include_headers: bool = False):
+    """ Appends a dataframe to a sheet of an ODS workbook, before the first empty row of the sheet,
+    or after its last row when it has no empty row.
+    Only the beginning of content.xml up to the insertion point is parsed.
+
+    :param df: the dataframe to append
+    :param odsfile: the workbook
+    :param sheet_name: the name of the sheet
+    :param include_headers: True to include the dataframe headers in the import"""
+    odsfile = Path(odsfile)
+    with zipfile.ZipFile(odsfile) as zin:
+        scanner = SheetScanner(sheet_name)
+        with zin.open(CONTENT) as stream:
+            if not scanner.scan(stream):
+                raise KeyError(f'sheet {sheet_name} not found in the workbook')
+        formatter = RowFormatter(scanner.prefixes, scanner.styles, scanner.rules, len(df.columns))
+
+        # the new archive is written next to the workbook, then replaces it
+        handle, temporary = tempfile.mkstemp(suffix='.ods', dir=odsfile.parent)
+        os.close(handle)
+        try:
+            with zipfile.ZipFile(temporary, 'w') as zout:
+                for info in zin.infolist():
+                    if info.filename != CONTENT:
+                        copy_entry(zin, zout, info)
+                        continue
+                    target = zipfile.ZipInfo(CONTENT, date_time=info.date_time)
+                    target.compress_type = zipfile.ZIP_DEFLATED
+                    with zin.open(info) as source, zout.open(target, 'w') as destination:
+                        remaining = scanner.offset
+                        while remaining > 0:
+                            chunk = source.read(min(CHUNK_SIZE, remaining))
+                            destination.write(chunk)
+                            remaining -= len(chunk)
+                        for row in formatter.format_frame(df, include_headers):
+                            destination.write(row.encode('utf-8'))
+                        shutil.copyfileobj(source, destination, CHUNK_SIZE)
+            os.replace(temporary, odsfile)
+        except BaseException:
+            os.remove(temporary)
+            raise
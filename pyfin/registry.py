@@ -0,0 +1,165 @@
+"""
+Module to discover the extractors.
+A source of statements is declared by a plugin, registered under the 'pyfin.extractors' entry point group.
+The plugin probes cheaply whether its source has new data, and only then imports and creates its extractors,
+so that the idle sources cost neither their imports nor their authentication.
+"""
+import re
+import logging
+from abc import ABC, abstractmethod
+from pathlib import Path
+from importlib.metadata import entry_points
+
+from pyfin.logger import write_log_entry
+
+entry_point_group = 'pyfin.extractors'
+
+# the names of the downloaded statement files
+credit_agricole_files = r'CA\d{8}_\d{6}'
+boursorama_files = r'export-operations'
+
+
+class ExtractorSettings:
+    """ The settings shared by all the extractors of a run"""
+
+    def __init__(self, endpoint: str, archivepoint: str, authentication_key: str = '', cache=None,
+                 stop_at_watermark: bool = False):
+        """
+        :param endpoint: the download folder, relative to the home folder
+        :param archivepoint: the archive subfolder
+        :param authentication_key: the google service account file
+        :param cache: the StatementCache of the parsed statement files, if any
+        :param stop_at_watermark: True to stop reading the sorted statements at the watermark of the account"""
+        self.endpoint = endpoint
+        self.archivepoint = archivepoint
+        self.authentication_key = authentication_key
+        self.cache = cache
+        self.stop_at_watermark = stop_at_watermark
+
+
+class ExtractorPlugin(ABC):
+    """ Abstract plugin of a source of statements"""
+    name = ''
+
+    def has_new_data(self, settings: ExtractorSettings) -> bool:
+        """ Cheap probe telling if the source has data to import. By default, a source is always read"""
+        return True
+
+    @abstractmethod
+    def create(self, settings: ExtractorSettings) -> list:
+        """ Imports and creates the extractors of the source"""
+
+
+class StatementFilesPlugin(ExtractorPlugin):
+    """ Plugin of a source downloaded as statement files : it has new data when a statement file is waiting"""
+    pattern = ''
+
+    def has_new_data(self, settings: ExtractorSettings) -> bool:
+        downloads = Path.home().joinpath(settings.endpoint)
+        return downloads.is_dir() and any(re.match(self.pattern, f.name) for f in downloads.iterdir())
+
+
+class CreditAgricolePlugin(StatementFilesPlugin):
+    name = 'Crédit Agricole'
+    pattern = credit_agricole_files
+
+    def create(self, settings: ExtractorSettings) -> list:
+        from pyfin.extractors import ExtractorCreditAgricole
+        return [ExtractorCreditAgricole(settings.endpoint, settings.archivepoint,
+                                        stop_at_watermark=settings.stop_at_watermark, cache=settings.cache)]
+
+
+class BoursoramaPlugin(StatementFilesPlugin):
+    name = 'Boursorama'
+    pattern = boursorama_files
+
+    def create(self, settings: ExtractorSettings) -> list:
+        from pyfin.extractors import ExtractorBoursorama
+        return [ExtractorBoursorama(settings.endpoint, settings.archivepoint, cache=settings.cache)]
+
+
+class LiquidePlugin(ExtractorPlugin):
+    """ The cash accounts, kept in a google sheet. Probing the sheet would already need the authentication,
+    so the accounts are read whenever a service account is configured"""
+    name = 'Liquide'
+    accounts = ['Liquide Vincent', 'Liquide Aurélie']
+
+    def has_new_data(self, settings: ExtractorSettings) -> bool:
+        if settings.authentication_key is None or settings.authentication_key == '':
+            # the cash accounts would be missing from the import without notice
+            write_log_entry(__file__, f'no service account key configured, the accounts {", ".join(self.accounts)} '
+                                      f'are not imported', level=logging.WARNING)
+            return False
+        return True
+
+    def create(self, settings: ExtractorSettings) -> list:
+        from pyfin.extractors import ExtractorLiquide
+        from pyfin.sheetssession import SheetsSession
+        # the cash accounts are read from the same workbook
+        session = SheetsSession(settings.authentication_key)
+        return [ExtractorLiquide(a, settings.endpoint, settings.archivepoint, settings.authentication_key, session)
+                for a in self.accounts]
+
+
+class FictitiousPlugin(ExtractorPlugin):
+    """ The fictitious dataset of the test mode"""
+    name = 'Test'
+
+    def create(self, settings: ExtractorSettings) -> list:
+        from pyfin.extractors import ExtractorTest
+        return [ExtractorTest('Compte De Test', settings.endpoint, settings.archivepoint)]
+
+
+# the plugins of the package, used when it is run without being installed
+builtin_plugins = [CreditAgricolePlugin, BoursoramaPlugin, LiquidePlugin]
+
+
+class ExtractorRegistry:
+    """ The plugins of the sources of statements, by name"""
+
+    def __init__(self, plugins: list = None):
+        """
+        :param plugins: the plugin classes or instances. By default, the builtin plugins and the installed ones"""
+        self.__plugins__ = {}
+        for p in (builtin_plugins + self.discover()) if plugins is None else plugins:
+            self.register(p)
+
+    @staticmethod
+    def discover() -> list:
+        """ Loads the plugins registered under the entry point group. The plugins are light : loading them
+        does not import the extractors"""
+        result = []
+        for ep in entry_points(group=entry_point_group):
+            try:
+                result.append(ep.load())
+            except Exception as e:
+                write_log_entry(__file__, f'could not load the extractor plugin {ep.name} : {e}')
+        return result
+
+    def register(self, plugin):
+        """ Registers a plugin, replacing the one of the same name"""
+        plugin = plugin() if isinstance(plugin, type) else plugin
+        self.__plugins__[plugin.name] = plugin
+
+    def get_plugins(self) -> list:
+        return list(self.__plugins__.values())
+
+    def get_extractors(self, settings: ExtractorSettings, only_pending: bool = True) -> list:
+        """ Creates the extractors of the sources
+
+        :param only_pending: True to skip the sources without new data"""
+        result = []
+        for p in self.get_plugins():
+            if only_pending and not p.has_new_data(settings):
+                write_log_entry(__file__, f'no new data for {p.name}, skipping')
+                continue
+            result += p.create(settings)
+        return result
+
+
+def get_extractors(settings: ExtractorSettings, test_mode: bool = False, only_pending: bool = True) -> list:
+    """ Creates the extractors of the run : the fictitious one in test mode, otherwise the ones of the sources
+
+    :param only_pending: True to skip the sources without new data"""
+    registry = ExtractorRegistry([FictitiousPlugin] if test_mode else None)
+    return registry.get_extractors(settings, only_pending=only_pending and not test_mode)
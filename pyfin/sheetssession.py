@@ -0,0 +1,86 @@
+"""
+Module to share a Google Sheets session between the extractors reading the same workbook.
+The session is authorised once, the workbook is opened once, and the worksheets requested by the extractors
+are downloaded together with a single batched values request.
+"""
+from threading import Lock
+from typing import TYPE_CHECKING
+
+import pandas as pd
+
+from pyfin.logger import write_log_entry
+
+# pygsheets loads the whole google api client stack : it is imported when a session is first used
+if TYPE_CHECKING:
+    import pygsheets
+
+
+def authorize(authentication_key: str) -> 'pygsheets.client.Client':
+    import pygsheets
+
+    return pygsheets.authorize(service_account_file=authentication_key)
+
+
+def get_range(title: str) -> str:
+    """ Returns the A1 notation of a whole worksheet"""
+    return "'" + title.replace("'", "''") + "'"
+
+
+def convert_values_to_frame(values: list, empty_value: str = '') -> pd.DataFrame:
+    """ Converts the values of a worksheet into a dataframe, the first row being the header.
+    The rows are padded and the numbers converted, as pygsheets does for a single worksheet"""
+    from pygsheets.utils import numericise_all
+
+    if len(values) == 0:
+        return pd.DataFrame()
+    width = max(len(row) for row in values)
+    values = [numericise_all(row + [empty_value] * (width - len(row)), empty_value) for row in values]
+    return pd.DataFrame(values[1:], columns=values[0])
+
+
+class SheetsSession:
+    """ Google Sheets session on a workbook, shared by several extractors and safe to use from several threads"""
+
+    def __init__(self, authentication_key: str, workbook_title: str = 'Dépenses Liquides', client_factory=None):
+        """
+        :param authentication_key: the service account file
+        :param workbook_title: the title of the workbook to open
+        :param client_factory: the function creating an authorised client from the key, pygsheets by default"""
+        self.__authentication_key__ = authentication_key
+        self.__workbook_title__ = workbook_title
+        self.__client_factory__ = authorize if client_factory is None else client_factory
+        self.__lock__ = Lock()
+        self.__client__ = None
+        self.__workbook__ = None
+        self.__requested__ = []
+        self.__frames__ = {}
+
+    def request(self, title: str):
+        """ Registers a worksheet to download with the next batch"""
+        with self.__lock__:
+            if title not in self.__requested__:
+                self.__requested__.append(title)
+
+    def get_workbook(self):
+        """ Returns the workbook, authorising and opening it on first use. To be called under the lock"""
+        if self.__workbook__ is None:
+            self.__client__ = self.__client_factory__(self.__authentication_key__)
+            self.__workbook__ = self.__client__.open(self.__workbook_title__)
+        return self.__workbook__
+
+    def get_frame(self, title: str) -> pd.DataFrame:
+        """ Returns the content of a worksheet as a dataframe.
+        The first call downloads all the requested worksheets at once"""
+        with self.__lock__:
+            if title not in self.__frames__:
+                workbook = self.get_workbook()
+                titles = [ws.title for ws in workbook]
+                if title not in titles:
+                    raise KeyError(f'the sheet corresponding the the account name {title} was not found')
+                batch = [t for t in self.__requested__ if t in titles and t not in self.__frames__]
+                batch += [] if title in batch else [title]
+                write_log_entry(__file__, f'downloading the worksheets {batch} of {self.__workbook_title__}')
+                value_ranges = self.__client__.sheet.values_batch_get(workbook.id, [get_range(t) for t in batch])
+                for t, value_range in zip(batch, value_ranges):
+                    self.__frames__[t] = convert_values_to_frame(value_range.get('values', []))
+            return self.__frames__[title].copy()
@@ -0,0 +1,112 @@
+"""
+Module to keep the statements parsed by the extractors on disk.
+An entry is addressed by the content of the statement file, the extractor and the version of its parsing,
+so that a renamed or re-downloaded statement is still found, and a modified parsing is not served stale data.
+"""
+import datetime as dt
+import hashlib
+import os
+import tempfile
+from pathlib import Path
+
+import pandas as pd
+
+from pyfin.logger import write_log_entry
+
+
+class StatementCache:
+    """ Content-addressed cache of the dataframes parsed from the statement files.
+    The entries are pickled dataframes, evicted by age and by total size"""
+    __suffix__ = '.pkl'
+
+    def __init__(self, folder: Path, max_age_days: int = 30, max_size_mb: float = 500):
+        self.__folder__ = Path(folder).expanduser()
+        self.__max_age__ = dt.timedelta(days=max_age_days)
+        self.__max_size__ = int(max_size_mb * 1024 * 1024)
+
+    @property
+    def folder(self) -> Path:
+        return self.__folder__
+
+    @staticmethod
+    def hash_file(f: Path) -> str:
+        """ Returns the sha256 of the content of a file, read by chunks"""
+        digest = hashlib.sha256()
+        with open(f, 'rb') as content:
+            for chunk in iter(lambda: content.read(1024 * 1024), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def get_entry(self, f: Path, extractor_name: str, version: int, variant: str = '') -> Path:
+        """
+        :param variant: what else the parsed data depends on, if anything, such as a watermark"""
+        key = f'{self.hash_file(f)}|{extractor_name}|{version}' + (f'|{variant}' if variant != '' else '')
+        key = hashlib.sha256(key.encode('utf-8')).hexdigest()
+        return self.__folder__.joinpath(key + self.__suffix__)
+
+    def get(self, f: Path, extractor_name: str, version: int, variant: str = '') -> pd.DataFrame:
+        """ Returns the dataframe parsed from the file, or None if it is not in the cache"""
+        return self.read_entry(self.get_entry(f, extractor_name, version, variant))
+
+    def put(self, f: Path, extractor_name: str, version: int, df: pd.DataFrame, variant: str = ''):
+        """ Stores the dataframe parsed from the file"""
+        self.write_entry(self.get_entry(f, extractor_name, version, variant), df)
+
+    def read_entry(self, entry: Path) -> pd.DataFrame:
+        """ Returns the dataframe of an entry, or None if there is no such entry"""
+        if not entry.exists():
+            return None
+        try:
+            result = pd.read_pickle(entry)
+        except Exception as e:
+            write_log_entry(__file__, f'discarding the unreadable cache entry {entry.name} : {e}')
+            entry.unlink(missing_ok=True)
+            return None
+        # the entry was used : it is the last one to be evicted
+        os.utime(entry)
+        return result
+
+    def write_entry(self, entry: Path, df: pd.DataFrame):
+        """ Stores the dataframe of an entry. The entry is written aside then renamed,
+        as several extractors may write at the same time"""
+        self.__folder__.mkdir(parents=True, exist_ok=True)
+        handle, temporary = tempfile.mkstemp(suffix='.tmp', dir=self.__folder__)
+        os.close(handle)
+        try:
+            df.to_pickle(temporary)
+            os.replace(temporary, entry)
+        except BaseException:
+            os.remove(temporary)
+            raise
+
+    def get_or_parse(self, f: Path, extractor_name: str, version: int, parse, variant: str = '') -> pd.DataFrame:
+        """ Returns the dataframe of the file from the cache, or parses the file and stores the result.
+        The file is hashed once, for the lookup and the storage
+
+        :param parse: the function parsing the file into a dataframe
+        :param variant: what else the parsed data depends on, if anything"""
+        entry = self.get_entry(f, extractor_name, version, variant)
+        result = self.read_entry(entry)
+        if result is None:
+            result = parse(f)
+            self.write_entry(entry, result)
+        return result
+
+    def evict(self, now: dt.datetime = None) -> int:
+        """ Removes the entries not used for longer than the maximum age,
+        then the least recently used ones until the cache fits in its maximum size.
+
+        :returns: the number of removed entries"""
+        if not self.__folder__.exists():
+            return 0
+        now = dt.datetime.now() if now is None else now
+        entries = sorted(((e.stat().st_mtime, e.stat().st_size, e) for e in self.__folder__.iterdir()
+                          if e.suffix == self.__suffix__), key=lambda entry: entry[0])
+        removed = 0
+        total = sum(size for _, size, _ in entries)
+        for mtime, size, entry in entries:
+            if now - dt.datetime.fromtimestamp(mtime) > self.__max_age__ or total > self.__max_size__:
+                entry.unlink(missing_ok=True)
+                total -= size
+                removed += 1
+        return removed
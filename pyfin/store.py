@@ -6,11 +6,14 @@ import pathlib
 
 from sqlalchemy.orm import Session
 
+import logging
+
 from pyfin.logger import write_log_entry, write_log_section, write_line
 
 import pyfin.odfpandas as op
-from sqlalchemy import engine
-from pyfin.database import Job, create_new_job_import, get_mouvements, Mouvement, is_equal_amount_compte, \
+from pyfin.odsstream import append_frame_to_ods
+from sqlalchemy import engine, insert, update
+from pyfin.database import Job, create_new_job_import, get_mouvements, Mouvement, ReconciliationIndex, \
     get_mouvements_by_account
 
 
@@ -70,6 +73,31 @@ def cast_as_string(value):
     return None if value in ('nan', '') else value
 
 
+def get_mouvement_values(m: Mouvement, attributes: list) -> dict:
+    """ Returns the values of the given attributes of a movement, as a mapping for the bulk statements"""
+    return {a: getattr(m, a) for a in attributes}
+
+
+def store_mouvements_in_bulk(session: Session, job: Job, inserted: list, updated: list):
+    """ Writes the new movements with a single executemany insert, and the reconciled movements
+    with a single bulk update by primary key, without going through the ORM unit of work"""
+    inserted_attributes = ['no', 'date', 'description', 'recette', 'depense', 'compte', 'categorie',
+                           'no_de_reference', 'mois', 'organisme', 'date_insertion', 'declarant', 'employeur']
+    updated_attributes = ['index', 'date', 'description', 'label_utilisateur']
+
+    # the job is needed first, to link the movements to it
+    session.add(job)
+    session.flush()
+
+    if len(inserted) > 0:
+        session.execute(insert(Mouvement),
+                        [get_mouvement_values(m, inserted_attributes) |
+                         {'date_out_of_bound': m.date_out_of_bound is True, 'job_id': job.job_id}
+                         for m in inserted])
+    if len(updated) > 0:
+        session.execute(update(Mouvement), [get_mouvement_values(m, updated_attributes) for m in updated])
+
+
 def convert_frame_to_mouvements(df: pd.DataFrame, job: Job) -> list:
     # reset the index
     df.reset_index(inplace=True)
@@ -106,7 +134,10 @@ def convert_frame_to_mouvements(df: pd.DataFrame, job: Job) -> list:
     return result
 
 
-def store_frame_to_ods(insertable: pd.DataFrame, odsfile: pathlib.Path, comptes_sheet: str):
+def store_frame_to_ods(insertable: pd.DataFrame, odsfile: pathlib.Path, comptes_sheet: str, streaming: bool = True):
+    """ Appends the rows to the comptes sheet of the workbook
+
+    :param streaming: True to splice the rows in the archive without loading the workbook, False to go through the DOM"""
     if len(insertable) > 0:
         # reconvert the date column to date time
         for column in ['Date', 'Mois', 'InsertDate']:
@@ -115,16 +146,19 @@ def store_frame_to_ods(insertable: pd.DataFrame, odsfile: pathlib.Path, comptes_
         for column in ['Dépense', 'Recette']:
             insertable[column] = insertable[column].astype(float)
 
-        wb = op.SpreadsheetWrapper()
-        wb.load(odsfile)
-        # get the sheet
-        ws: op.SheetWrapper
-        ws = wb.get_sheets().get(comptes_sheet)
-        if not ws is None:
-            ws.insert_from_dataframe(insertable, include_headers=False, mode='append')
-            wb.save(odsfile)
+        if streaming:
+            append_frame_to_ods(insertable, odsfile, comptes_sheet)
         else:
-            raise KeyError(f'sheet {comptes_sheet} not found in the workbook')
+            wb = op.SpreadsheetWrapper()
+            wb.load(odsfile)
+            # get the sheet
+            ws: op.SheetWrapper
+            ws = wb.get_sheets().get(comptes_sheet)
+            if not ws is None:
+                ws.insert_from_dataframe(insertable, include_headers=False, mode='append')
+                wb.save(odsfile)
+            else:
+                raise KeyError(f'sheet {comptes_sheet} not found in the workbook')
 
 
 def store_frame_to_sql(insertable: pd.DataFrame, e: engine, table: str):
@@ -144,20 +178,26 @@ def store_frame_to_sql(insertable: pd.DataFrame, e: engine, table: str):
 
 
 def store_frame_to_sql_mode_7(insertable: pd.DataFrame, e: engine, start_date: date,
-                              end_date: date, start_index: int, simulate: bool = False, account_name: str = None):
-    """ Special mode for importing into the database"""
+                              end_date: date, start_index: int, simulate: bool = False, account_name: str = None,
+                              bulk: bool = True, mvt_futurs: list = None):
+    """ Special mode for importing into the database
+
+    :param bulk: True to write the movements with bulk statements, False to go through the ORM session
+    :param mvt_futurs: the pending movements, when already loaded. Otherwise they are queried"""
     # remap the columns
     insertable = validate_frame(insertable)
 
     # récupérer les mouvements futurs
     sqlcontexte = 'SQL import mode 7'
-    if account_name is None:
+    if mvt_futurs is not None:
+        write_log_entry(sqlcontexte, f'{len(mvt_futurs)} pending movements provided for the account {account_name}')
+    elif account_name is None:
         write_log_entry(sqlcontexte, f'Warning ! Import is in global mode, not account specific')
-        mvt_futurs = get_mouvements(start_date, end_date)
+        mvt_futurs = get_mouvements(start_date, end_date, e=e)
         write_log_entry(sqlcontexte, f'retrieved {len(mvt_futurs)} over the period {start_date}, {end_date}')
     else:
         write_log_entry(sqlcontexte, f'Import is done specifically for the account {account_name}')
-        mvt_futurs = get_mouvements_by_account(start_date, end_date, account_name)
+        mvt_futurs = get_mouvements_by_account(start_date, end_date, account_name, e=e)
         write_log_entry(sqlcontexte,
                         f'retrieved {len(mvt_futurs)} over the period {start_date}, {end_date} for account {account_name}')
 
@@ -165,68 +205,81 @@ def store_frame_to_sql_mode_7(insertable: pd.DataFrame, e: engine, start_date: d
     importjob = create_new_job_import()
 
     # iterate over the transactions
-    candidates = convert_frame_to_mouvements(insertable, importjob)
+    # in bulk mode, the job is linked when inserting the rows
+    candidates = convert_frame_to_mouvements(insertable, None if bulk else importjob)
+    updated = []
 
     write_log_entry(sqlcontexte, f'{len(candidates)} to check')
 
+    # index the future movements
+    pending = ReconciliationIndex(mvt_futurs)
+
     # Start of the mega-check
     with Session(e) as session:
         for i, candidate in enumerate(candidates):
-            write_line()
-            write_log_section(f'*** Candidate n°{i}***')
-            write_log_entry(sqlcontexte, f'checking candidate {candidate}...')
+            # the trace of each candidate is only formatted at the debug level
+            write_line(level=logging.DEBUG)
+            write_log_section('*** Candidate n°%d***', i, level=logging.DEBUG)
+            write_log_entry(sqlcontexte, 'checking candidate %s...', candidate, level=logging.DEBUG)
             # Est-ce que c'est un chèque ?
             if candidate.is_cheque():
                 # Existe-t-il un mouvement avec ce numéro de chèque ?
-                write_log_entry(sqlcontexte, f'the candidate is a cheque (number : {candidate.no_de_reference})')
-                cheques = [c for c in mvt_futurs if c.no_de_reference == candidate.no_de_reference]
-                if len(cheques) > 0:
-                    cheque = cheques[0]
-                    write_log_entry(sqlcontexte, f'a corresponding move was found with ID {cheque.index}')
+                write_log_entry(sqlcontexte, 'the candidate is a cheque (number : %s)', candidate.no_de_reference,
+                                level=logging.DEBUG)
+                cheque = pending.pop_cheque(candidate)
+                if cheque is not None:
+                    write_log_entry(sqlcontexte, 'a corresponding move was found with ID %s', cheque.index,
+                                    level=logging.DEBUG)
                     cheque.date = candidate.date
                     cheque.label_utilisateur = cheque.description
                     cheque.description = candidate.description
                     candidate.date_out_of_bound = True
-                    session.add(cheque)
-                    mvt_futurs.remove(cheque)
-                    write_log_entry(sqlcontexte, f'reduced size of transactions : {len(mvt_futurs)} actual size')
+                    updated.append(cheque)
+                    write_log_entry(sqlcontexte, 'reduced size of transactions : %d actual size', len(pending),
+                                    level=logging.DEBUG)
                 else:
                     # aucun chèque correspondant trouvé
-                    write_log_entry(sqlcontexte, f'no corresponding cheque found')
+                    write_log_entry(sqlcontexte, 'no corresponding cheque found', level=logging.DEBUG)
             else:
                 # Existe-t-il un mouvement de même compte, montant (auquel cas ceci est un virement ou une dépense notée en avance) ?
-                similars = [s for s in mvt_futurs if is_equal_amount_compte(s, candidate)]
-                if len(similars) > 0:
-                    similar = similars[0]
-                    write_log_entry(sqlcontexte, f'a similar transaction was found : {similar}')
+                similar = pending.pop_similar(candidate)
+                if similar is not None:
+                    write_log_entry(sqlcontexte, 'a similar transaction was found : %s', similar, level=logging.DEBUG)
                     similar.date = candidate.date
                     if similar.label_utilisateur is None:
                         similar.label_utilisateur = similar.description
                     similar.description = candidate.description
                     candidate.date_out_of_bound = True
-                    session.add(similar)
-                    mvt_futurs.remove(similar)
-                    write_log_entry(sqlcontexte, f'reduced size of transactions : {len(mvt_futurs)} actual size')
+                    updated.append(similar)
+                    write_log_entry(sqlcontexte, 'reduced size of transactions : %d actual size', len(pending),
+                                    level=logging.DEBUG)
                 else:
                     # aucun mouvement trouvé
-                    write_log_entry(sqlcontexte, f'no similar transaction was found')
+                    write_log_entry(sqlcontexte, 'no similar transaction was found', level=logging.DEBUG)
 
-            # add the candidate to the session
+            # number the candidate
             candidate.no = start_index
             start_index += 1
-            session.add(candidate)
-            write_log_entry(sqlcontexte, f'candidate added to the session')
+            write_log_entry(sqlcontexte, 'candidate numbered %d', candidate.no, level=logging.DEBUG)
 
         write_log_section('*** Handling stragglers ***')
         # Second loop : remaining mouvements
-        for m in mvt_futurs:
+        for m in pending.remaining():
             # shift the mouvement to the end of the period
             if m.get_solde() != 0:
-                write_log_entry(sqlcontexte, f'future movement found : {m}. Shifting the date...')
+                write_log_entry(sqlcontexte, 'future movement found : %s. Shifting the date...', m, level=logging.DEBUG)
                 m.date = end_date + timedelta(days=1)
-                session.add(m)
+                updated.append(m)
             else:
-                write_log_entry(sqlcontexte, f'found a mouvement with 0 solde : {m}. Doing nothing.')
+                write_log_entry(sqlcontexte, 'found a mouvement with 0 solde : %s. Doing nothing.', m, level=logging.DEBUG)
+
+        # write the changes
+        if bulk:
+            write_log_entry(sqlcontexte, f'bulk writing {len(candidates)} new and {len(updated)} updated movements')
+            store_mouvements_in_bulk(session, importjob, candidates, updated)
+        else:
+            session.add_all(updated)
+            session.add_all(candidates)
 
         # flush and commit
         session.flush()
@@ -4,7 +4,10 @@ setup(
     name='pyfin',
     version='1.3.9',
     packages=['pyfin'],
-    entry_points = {'console_scripts': ['pyfin_launch=pyfin.__main__:main']},
+    entry_points = {'console_scripts': ['pyfin_launch=pyfin.__main__:main'],
+                    'pyfin.extractors': ['credit_agricole=pyfin.registry:CreditAgricolePlugin',
+                                         'boursorama=pyfin.registry:BoursoramaPlugin',
+                                         'liquide=pyfin.registry:LiquidePlugin']},
     install_requires=['openpyxl', 'pandas', 'pygsheets', 'odfpy'],
     url='www.pyfin.org',
     license='GNU',
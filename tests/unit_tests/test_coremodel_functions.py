@@ -1,4 +1,5 @@
 from unittest import TestCase
+from unittest.mock import patch
 import pandas as pd
 import datetime as dt
 from pyfin.coremodel import set_index, explode_values
@@ -10,8 +11,37 @@ from pyfin.coremodel import filter_by_date
 from pyfin.coremodel import get_transaction_description
 from pyfin.coremodel import breakdown_value
 from pyfin.coremodel import breakdown_period
+from pyfin.coremodel import match_first_keyword
+from pyfin.coremodel import map_keywords
+from pyfin.coremodel import KeywordMatcher
+from pyfin.coremodel import map_categories
+from pyfin.database import MapCategorie
+from pyfin.coremodel import Extractor
+from pyfin.coremodel import extract_all
+from pyfin.coremodel import shift_month
+from pyfin.coremodel import shift_months
+from pyfin.coremodel import set_exclusion
+from pyfin.coremodel import normalize_descriptions
+from pyfin.configmanager import AppConfiguration
+from pathlib import Path
+from tempfile import TemporaryDirectory
 from numpy.random import randint
 from numpy.random import rand
+import time
+
+
+class SlowExtractor(Extractor):
+    def __init__(self, account_name: str, delay: float, executor: str):
+        super().__init__(account_name, '', '')
+        self.__delay__ = delay
+        self.executor = executor
+        self.extracted = False
+
+    def get_data(self, since: dt.date = None) -> pd.DataFrame:
+        time.sleep(self.__delay__)
+        self.extracted = True
+        return pd.DataFrame({'Compte': [self.name]})
+
 
 class TestCoreModelFunctions(TestCase):
 
@@ -42,6 +72,24 @@ class TestCoreModelFunctions(TestCase):
         self.assertEqual(result[0], '1234567', 'Vérification de la longueur de la série')
         self.assertEqual(result[1], '7654321', 'Vérification de la longueur de la série')
 
+    def test_parse_numero_cheque_second_line(self):
+        s = pd.Series(['Retrait 1234567', 'Paiement\nCheque Emis 1234567', 'CB 12345678 Cheque Emis 7654321'])
+        self.assertEqual(['', '', '1234567'], parse_numero_cheque(s).tolist())
+
+    def test_set_exclusion(self):
+        df = set_exclusion(self.dataframe.copy(), ['trait', 'x.y'])
+        self.assertEqual([False, True, False, True], df['excluded'].tolist())
+        df = set_exclusion(self.dataframe.copy(), [])
+        self.assertFalse(df['excluded'].any(), 'nothing should be excluded')
+
+    def test_normalize_descriptions(self):
+        df = self.dataframe.copy()
+        df['Description'] = ['CHEQUE EMIS 1234567', 'RETRAIT DAB', 'VIREMENT', 'retrait']
+        df = normalize_descriptions(df, ['RETRAIT'])
+        self.assertEqual(['Cheque Emis 1234567', 'Retrait Dab', 'Virement', 'Retrait'], df['Description'].tolist())
+        self.assertEqual(['1234567', '', '', ''], df['Numéro de référence'].tolist())
+        self.assertEqual([False, True, False, False], df['excluded'].tolist())
+
     def test_set_index(self):
         df = set_index('Index', 10, self.dataframe)
         self.assertTrue(df.loc[0, 'Index'] == 10, 'Start index is not 10')
@@ -95,5 +143,83 @@ class TestCoreModelFunctions(TestCase):
         print(df)
         self.assertIsNotNone(df, f'could not compute the exploded dataframe')
 
+    def test_keyword_matcher(self):
+        keywords = ['Leclerc', 'PRLV', 'vir', 'virement salaire', 'ement']
+        matcher = KeywordMatcher(keywords)
+        for label in ['Prlv Sepa Leclerc', 'VIREMENT SALAIRE', 'Courses Carrefour', 'salaire virement', 'Vi', '']:
+            self.assertEqual(match_first_keyword(label, keywords), matcher.match(label),
+                             f'the matcher and match_first_keyword disagree on {label}')
+
+    def test_map_keywords(self):
+        df = self.dataframe.copy()
+        df = map_keywords(df, 'Description', ['trans', 'RETRAIT', 'zzz'])
+        self.assertEqual(['trans', 'RETRAIT'], df.loc[[2, 3], 'Keyword'].tolist())
+        self.assertIsNone(df.loc[0, 'Keyword'], 'no keyword should be found for virement')
+
+    def test_keyword_matcher_precedence(self):
+        keywords = ['vir', 'virement salaire', 'salaire']
+        label = 'Virement Salaire Mars'
+        self.assertEqual(0, KeywordMatcher(keywords, precedence='first').match_position(label))
+        self.assertEqual(2, KeywordMatcher(keywords, precedence='last').match_position(label))
+        self.assertEqual(1, KeywordMatcher(keywords, precedence='longest').match_position(label))
+        self.assertEqual(-1, KeywordMatcher(keywords, case=True).match_position(label))
+
+    def test_map_categories(self):
+        df = self.dataframe.copy()
+        df['Catégorie'] = ''
+        categories = [MapCategorie(keyword='ret', categorie='Retraits'),
+                      MapCategorie(keyword='tr.i', categorie='Liquide'),
+                      MapCategorie(keyword='Trans', categorie='Virements')]
+        df = map_categories(df, categories)
+        self.assertEqual(['', 'Liquide', '', 'Liquide'], df['Catégorie'].tolist())
+
+    def test_extract_all(self):
+        ex = [SlowExtractor('A', 0.3, 'thread'), SlowExtractor('B', 0.1, 'process'), SlowExtractor('C', 0.0, 'thread')]
+        result = extract_all(ex, jobs=3)
+        self.assertEqual(['A', 'B', 'C'], [e.name for e, df in result], 'the order of the extractors was not kept')
+        self.assertEqual(['A', 'B', 'C'], [df.loc[0, 'Compte'] for e, df in result])
+        self.assertTrue(all(e.extracted for e, df in result), 'the state of the extractors was lost')
+
+    def test_extract_all_threads_only(self):
+        ex = [SlowExtractor('A', 0.0, 'thread'), SlowExtractor('B', 0.0, 'thread')]
+        with patch('pyfin.coremodel.ProcessPoolExecutor') as processes:
+            result = extract_all(ex, jobs=2)
+        processes.assert_not_called()
+        self.assertEqual(['A', 'B'], [e.name for e, df in result])
+
+    def test_shift_months(self):
+        dates = pd.Series([dt.date(2024, 1, 31), dt.date(2023, 12, 15), dt.date(2024, 2, 29), dt.date(2024, 7, 1)])
+        shifts = pd.Series([-1, 1, float('nan'), -19])
+        expected = [shift_month(d, 0 if pd.isna(m) else m) for d, m in zip(dates, shifts)]
+        self.assertEqual(expected, shift_months(dates, shifts).tolist())
+        self.assertEqual(dt.date(2022, 12, 1), shift_months(dates, shifts)[3])
+
+    def test_explode_periods(self):
+        df = pd.DataFrame({'Dépense': [1000.0, 5.0], 'Mois': [dt.date(2024, 8, 1)] * 2})
+        result = explode_values(df, 'Dépense', 'Mois', periods=6, start_month=11, threshold=150)
+        self.assertEqual(7, len(result))
+        self.assertEqual([166.67] * 5 + [166.65], result.loc[0, 'Dépense'].tolist())
+        self.assertAlmostEqual(1000.0, sum(result.loc[0, 'Dépense']))
+        self.assertEqual(dt.date(2024, 11, 1), result.loc[0, 'Mois'].iloc[0])
+        self.assertEqual(dt.date(2025, 4, 1), result.loc[0, 'Mois'].iloc[-1])
+        self.assertEqual(5.0, result.loc[1, 'Dépense'])
+
+    def test_explode_configured_threshold(self):
+        df = pd.DataFrame({'Dépense': [1200.0, 300.0, 5.0], 'Mois': [dt.date(2024, 8, 1)] * 3})
+        with TemporaryDirectory() as folder:
+            config_file = Path(folder).joinpath('pyfin.conf')
+            config_file.write_text('[OTHER]\nperiodization_threshold = 500\n')
+            threshold = AppConfiguration(config_file).periodization_threshold
+            self.assertEqual(500.0, threshold)
+            # only the expense reaching the configured threshold is spread over the year
+            result = explode_values(df, 'Dépense', 'Mois', threshold=threshold)
+            self.assertEqual(14, len(result))
+            self.assertEqual([100.0] * 12, result.loc[0, 'Dépense'].tolist())
+            # an empty threshold spreads nothing
+            config_file.write_text('[OTHER]\nperiodization_threshold =\n')
+            threshold = AppConfiguration(config_file).periodization_threshold
+            self.assertIsNone(threshold)
+            self.assertEqual(3, len(explode_values(df, 'Dépense', 'Mois', threshold=threshold)))
+
     def tearDown(self):
         self.dataframe = None
@@ -0,0 +1,75 @@
+from unittest import TestCase
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+from pyfin.database import EngineRegistry, Base, MapCategorie, Mouvement, Job, get_map_categories, \
+    get_map_categories_dataframe, migrate_schema, get_last_updates_by_account, get_mouvements_by_account, \
+    ImportContext
+import datetime as dt
+from sqlalchemy import inspect
+from sqlalchemy.orm import Session
+
+
+class TestEngineRegistry(TestCase):
+    def setUp(self):
+        self.folder = TemporaryDirectory()
+        self.url = 'sqlite:///' + str(Path(self.folder.name).joinpath('finance.sqlite'))
+        self.registry = EngineRegistry()
+        self.registry.configure(self.url, pool_size=2)
+
+    def test_same_engine(self):
+        e = self.registry.get_engine()
+        self.assertIs(e, self.registry.get_engine(), 'the engine should be created only once')
+        self.assertIs(e, self.registry.get_engine(self.url), 'the engine should be shared by URL')
+
+    def test_shared_queries(self):
+        e = self.registry.get_engine()
+        Base.metadata.create_all(e)
+        with Session(e) as session:
+            session.add(MapCategorie(keyword='Leclerc', categorie='Courses', inactif=False))
+            session.add(MapCategorie(keyword='Total', categorie='Essence', inactif=True))
+            session.commit()
+        self.assertEqual(2, len(get_map_categories(e)))
+        self.assertEqual(['Leclerc'], get_map_categories_dataframe(e)['Keyword'].tolist())
+
+    def test_migrate_schema(self):
+        e = self.registry.get_engine()
+        Base.metadata.create_all(e)
+        # simulate a database created before the indexes were declared
+        for index in Mouvement.__table__.indexes:
+            index.drop(e)
+        created = migrate_schema(e)
+        self.assertEqual(3, len(created), 'the indexes were not created')
+        self.assertEqual([], migrate_schema(e), 'the migration should be idempotent')
+        names = {i['name'] for i in inspect(e).get_indexes('comptes')}
+        self.assertTrue({'ix_comptes_compte_date', 'ix_comptes_date_insertion', 'ix_comptes_no'} <= names)
+
+    def test_import_context(self):
+        e = self.registry.get_engine()
+        Base.metadata.create_all(e)
+        with Session(e) as session:
+            session.add(MapCategorie(keyword='Leclerc', categorie='Courses', inactif=False, monthshift=1))
+            session.add(MapCategorie(keyword='Total', categorie='Essence', inactif=True))
+            job = Job(job_key='import', job_timestamp=dt.datetime(2024, 3, 1))
+            for i, (compte, day) in enumerate([('CA', 1), ('CA', 10), ('CA', 20), ('Boursorama', 5), ('Liquide', 12)]):
+                session.add(Mouvement(no=i + 40, date=dt.date(2024, 3, day), description=f'Mouvement {i}',
+                                      compte=compte, categorie='Test', mois=dt.date(2024, 3, 1),
+                                      date_insertion=dt.date(2024, 3, day), date_out_of_bound=False, job=job))
+            session.commit()
+
+        start_date, end_date = dt.date(2024, 3, 3), dt.date(2024, 3, 31)
+        context = ImportContext().load(e, ['CA', 'Boursorama', 'Inconnu'], start_date, end_date)
+        self.assertEqual(45, context.next_index)
+        self.assertEqual({(d, c) for d, c in get_last_updates_by_account(e)},
+                         {(d, c) for c, d in context.last_updates.items()})
+        self.assertEqual(start_date, context.get_start_date('Inconnu', start_date))
+        for account in ['CA', 'Boursorama', 'Inconnu']:
+            account_start = context.get_start_date(account, start_date)
+            self.assertEqual([m.index for m in get_mouvements_by_account(account_start, end_date, account, e=e)],
+                             [m.index for m in context.get_mouvements_by_account(account_start, account)])
+        self.assertTrue(get_map_categories_dataframe(e).reset_index(drop=True).equals(
+            context.get_map_categories_dataframe().reset_index(drop=True)))
+
+    def tearDown(self):
+        self.registry.dispose()
+        self.folder.cleanup()
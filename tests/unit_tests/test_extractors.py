@@ -0,0 +1,117 @@
+from unittest import TestCase
+from pathlib import Path
+from tempfile import TemporaryDirectory
+import datetime as dt
+import os
+
+import openpyxl
+
+from pyfin.extractors import ExtractorCreditAgricole, ExtractorBoursorama
+from pyfin.statementcache import StatementCache
+
+
+class TestExtractorCreditAgricole(TestCase):
+    def setUp(self):
+        self.folder = TemporaryDirectory()
+        book = openpyxl.Workbook()
+        sheet = book.active
+        sheet.append(['Compte de dépôt', None, None, None])
+        sheet.append([None, None, None, None])
+        sheet.append(['Date', 'Libellé', 'Débit euros', 'Crédit euros'])
+        # the statements are sorted from the newest to the oldest row
+        for i in range(30):
+            day = dt.datetime(2024, 3, 30) - dt.timedelta(days=i)
+            sheet.append([day, f'PRLV SEPA\n  Fournisseur {i}', 10.0 + i, None])
+        sheet.append([None, None, None, None])
+        book.save(Path(self.folder.name).joinpath('CA20240330_120000.xlsx'))
+
+    def test_get_data(self):
+        e = ExtractorCreditAgricole(self.folder.name, 'ArchiveCA')
+        df = e.get_data()
+        self.assertEqual(30, len(df))
+        self.assertEqual('PRLV SEPA Fournisseur 0', df['Description'].iloc[0], 'the description was not cleaned')
+        self.assertEqual(dt.date(2024, 3, 30), df['Date'].iloc[0])
+        self.assertTrue((df['Compte'] == 'Crédit Agricole').all())
+
+    def test_batches(self):
+        e = ExtractorCreditAgricole(self.folder.name, 'ArchiveCA')
+        f = e.get_downloaded_releve(self.folder.name)[0]
+        batches = list(e.iter_releve(f, batch_size=8))
+        self.assertEqual([8, 8, 8, 6], [len(b) for b in batches])
+
+    def test_since(self):
+        since = dt.date(2024, 3, 21)
+        for stop in [False, True]:
+            e = ExtractorCreditAgricole(self.folder.name, 'ArchiveCA', stop_at_watermark=stop)
+            df = e.get_data(since=since)
+            self.assertEqual(10, len(df), 'the rows older than the watermark were not skipped')
+            self.assertTrue((df['Date'] >= since).all())
+
+    def test_old_modification_time(self):
+        # a copied or unzipped file can keep an old modification time : its new rows must still be read
+        f = Path(self.folder.name).joinpath('CA20240330_120000.xlsx')
+        mtime = dt.datetime(2024, 1, 1).timestamp()
+        os.utime(f, (mtime, mtime))
+        e = ExtractorCreditAgricole(self.folder.name, 'ArchiveCA')
+        df = e.get_data(since=dt.date(2024, 3, 21))
+        self.assertEqual(10, len(df), 'the new rows of a file with an old modification time were lost')
+        e.flush()
+        self.assertTrue(Path(self.folder.name).joinpath('ArchiveCA', f.name).exists(), 'the file was not archived')
+
+    def test_cache(self):
+        cache = StatementCache(Path(self.folder.name).joinpath('cache'))
+        expected = ExtractorCreditAgricole(self.folder.name, 'ArchiveCA').get_data(since=dt.date(2024, 3, 21))
+        for i in range(2):
+            e = ExtractorCreditAgricole(self.folder.name, 'ArchiveCA', cache=cache)
+            df = e.get_data(since=dt.date(2024, 3, 21))
+            self.assertEqual(expected['Description'].tolist(), df['Description'].tolist())
+            self.assertEqual(expected['Date'].tolist(), df['Date'].tolist())
+        # the whole file is cached once
+        self.assertEqual(1, len(list(cache.folder.iterdir())))
+        self.assertEqual(30, len(e.get_data()))
+
+    def test_cache_stop_at_watermark(self):
+        cache = StatementCache(Path(self.folder.name).joinpath('cache'))
+        for since, expected in [(dt.date(2024, 3, 21), 10), (dt.date(2024, 3, 21), 10), (dt.date(2024, 3, 26), 5)]:
+            e = ExtractorCreditAgricole(self.folder.name, 'ArchiveCA', stop_at_watermark=True, cache=cache)
+            df = e.get_data(since=since)
+            self.assertEqual(expected, len(df))
+            self.assertTrue((df['Date'] >= since).all())
+        # the file is read down to the watermark, and cached once per watermark
+        self.assertEqual(2, len(list(cache.folder.iterdir())))
+
+    def tearDown(self):
+        self.folder.cleanup()
+
+
+class CountingBoursorama(ExtractorBoursorama):
+    """ Counts the cleanings of the statements"""
+    cleaned = 0
+
+    def clean_releve_ba(self, raw_frame):
+        CountingBoursorama.cleaned += 1
+        return super().clean_releve_ba(raw_frame)
+
+
+class TestExtractorBoursorama(TestCase):
+    def setUp(self):
+        self.folder = TemporaryDirectory()
+        rows = [f'2024-03-{day:02d};2024-03-{day:02d};CB LECLERC {day};-{day},50' for day in range(1, 21)]
+        Path(self.folder.name).joinpath('export-operations-30-03-2024_12-00-00.csv').write_text(
+            'dateOp;dateVal;label;amount\n' + '\n'.join(rows) + '\n', encoding='utf-8')
+
+    def test_cache(self):
+        cache = StatementCache(Path(self.folder.name).joinpath('cache'))
+        expected = ExtractorBoursorama(self.folder.name, 'ArchiveBA').get_data(since=dt.date(2024, 3, 11))
+        self.assertEqual(10, len(expected))
+        CountingBoursorama.cleaned = 0
+        for since, count in [(dt.date(2024, 3, 11), 10), (dt.date(2024, 3, 11), 10), (None, 20)]:
+            df = CountingBoursorama(self.folder.name, 'ArchiveBA', cache=cache).get_data(since=since)
+            self.assertEqual(count, len(df))
+        self.assertEqual(expected['Dépense'].tolist(), df['Dépense'].tolist()[10:])
+        # the cleaned statement is cached : the hits skip the cleaning
+        self.assertEqual(1, CountingBoursorama.cleaned)
+        self.assertEqual(1, len(list(cache.folder.iterdir())))
+
+    def tearDown(self):
+        self.folder.cleanup()
@@ -1,7 +1,16 @@
 from unittest import TestCase
+from unittest.mock import patch
+from tempfile import TemporaryDirectory
+from datetime import date
 
+import pandas as pd
+from odf.opendocument import OpenDocumentSpreadsheet
+from odf.table import Table
 
-from pyfin.indexfinder import get_index_from_database, get_lastdate_from_database
+import pyfin.odfpandas as op
+
+from pyfin.indexfinder import get_index_from_database, get_lastdate_from_database, get_index_from_file, \
+    get_lastdate_from_file, read_comptes_columns, load_comptes_columns
 from pyfin.database import get_finance_engine
 from pathlib import Path
 
@@ -16,3 +25,53 @@ class Test(TestCase):
         e = get_finance_engine()
         dt = get_lastdate_from_database(e, 'comptes')
         print(f'date found : {dt}')
+
+
+class TestFromFile(TestCase):
+    def setUp(self):
+        self.folder = TemporaryDirectory()
+        self.df = pd.DataFrame(data={'N°': [1, 2, 3],
+                                     'Description': ['Loyer', 'Leclerc', 'Essence'],
+                                     'Date d\'insertion': pd.to_datetime(['2024-01-02', '2024-02-01', None])})
+
+        read_comptes_columns.cache_clear()
+
+    def tearDown(self):
+        self.folder.cleanup()
+
+    def test_from_ods(self):
+        comptes = Path(self.folder.name).joinpath('comptes.ods')
+        wb = OpenDocumentSpreadsheet()
+        wb.spreadsheet.addElement(Table(name='Mouvements'))
+        wb.write(comptes)
+        wb = op.SpreadsheetWrapper()
+        wb.load(comptes)
+        wb.get_sheets()['Mouvements'].insert_from_dataframe(self.df.fillna({'Date d\'insertion': pd.Timestamp(2000, 1, 1)}),
+                                                            include_headers=True)
+        wb.save(comptes)
+        # the sheet is scanned, the workbook is not loaded
+        with patch.object(op.SpreadsheetWrapper, 'load', side_effect=AssertionError('the workbook was loaded')):
+            self.assertEqual(get_index_from_file(comptes), 3)
+            self.assertEqual(get_lastdate_from_file(comptes), date(2024, 2, 1))
+
+    def test_from_csv(self):
+        comptes = Path(self.folder.name).joinpath('comptes.csv')
+        self.df.to_csv(comptes, index=False)
+        self.assertEqual(get_index_from_file(comptes), 3)
+        self.assertEqual(get_lastdate_from_file(comptes), date(2024, 2, 1))
+
+    def test_cached(self):
+        comptes = Path(self.folder.name).joinpath('comptes.csv')
+        self.df.to_csv(comptes, index=False)
+        self.assertEqual(get_index_from_file(comptes), 3)
+        self.assertEqual(get_lastdate_from_file(comptes), date(2024, 2, 1))
+        self.assertEqual(read_comptes_columns.cache_info().misses, 1)
+        self.assertEqual(list(read_comptes_columns(comptes.resolve(), comptes.stat().st_mtime_ns,
+                                                   comptes.stat().st_size, 'Mouvements').columns),
+                         ['N°', 'Date d\'insertion'])
+        # the cached columns are not altered by a caller modifying its frame
+        load_comptes_columns(comptes).rename(columns={'N°': 'Index'}, inplace=True)
+        self.assertEqual(get_index_from_file(comptes), 3)
+        # a new version of the file is read again
+        pd.concat([self.df, self.df.assign(**{'N°': 4})]).to_csv(comptes, index=False)
+        self.assertEqual(get_index_from_file(comptes), 4)
@@ -0,0 +1,80 @@
+from unittest import TestCase
+from pathlib import Path
+from tempfile import TemporaryDirectory
+import json
+
+import pandas as pd
+
+from pyfin.instrumentation import Instrumentation, instrumentation
+from pyfin.coremodel import extract_all, Extractor
+
+
+class SizedExtractor(Extractor):
+    """ Returns a dataframe of a given number of rows"""
+    def __init__(self, name: str, rows: int, executor: str):
+        super().__init__(name, 'Downloads', 'Archive')
+        self.rows = rows
+        self.executor = executor
+
+    def get_data(self, since=None) -> pd.DataFrame:
+        return pd.DataFrame({'Compte': [self.name] * self.rows})
+
+
+class TestInstrumentation(TestCase):
+    def setUp(self):
+        self.folder = TemporaryDirectory()
+        self.instrumentation = Instrumentation()
+
+    def tearDown(self):
+        instrumentation.reset()
+        self.folder.cleanup()
+
+    def test_stage(self):
+        with self.instrumentation.stage('filter', 'Compte', rows_in=10) as record:
+            record.rows_out = 4
+        records = self.instrumentation.get_records()
+        self.assertEqual(1, len(records))
+        self.assertEqual(('filter', 'Compte', 10, 4), (records[0].name, records[0].group, records[0].rows_in,
+                                                       records[0].rows_out))
+        self.assertGreaterEqual(records[0].wall_time, 0)
+
+    def test_stage_failing(self):
+        with self.assertRaises(ValueError):
+            with self.instrumentation.stage('failing'):
+                raise ValueError()
+        self.assertEqual(['failing'], [r.name for r in self.instrumentation.get_records()])
+
+    def test_run(self):
+        df = pd.DataFrame({'a': range(10)})
+        head, tail = self.instrumentation.run('split', lambda d: (d.head(3), d.tail(2)), df)
+        self.assertEqual(3, len(head))
+        record = self.instrumentation.get_records()[0]
+        self.assertEqual((10, 5), (record.rows_in, record.rows_out))
+
+    def test_summary(self):
+        self.instrumentation.run('copy', pd.DataFrame.copy, pd.DataFrame({'a': range(7)}), group='Compte')
+        summary = self.instrumentation.get_summary().splitlines()
+        self.assertEqual(4, len(summary))
+        self.assertIn('copy', summary[2])
+        self.assertIn('Compte', summary[2])
+        self.assertTrue(summary[3].startswith('total'))
+
+    def test_report(self):
+        self.instrumentation.run('copy', pd.DataFrame.copy, pd.DataFrame({'a': range(7)}))
+        report = Path(self.folder.name).joinpath('report.json')
+        self.instrumentation.write_report(report, mode='sql2')
+        with open(report, encoding='utf-8') as f:
+            content = json.load(f)
+        self.assertEqual('sql2', content['mode'])
+        self.assertEqual([{'stage': 'copy', 'rows_in': 7, 'rows_out': 7}],
+                         [{k: s[k] for k in ('stage', 'rows_in', 'rows_out')} for s in content['stages']])
+        self.assertGreaterEqual(content['stages'][0]['peak_rss_rise_kb'], 0)
+
+    def test_extract_all(self):
+        instrumentation.reset()
+        ex = [SizedExtractor('A', 3, 'thread'), SizedExtractor('B', 5, 'process')]
+        result = extract_all(ex, jobs=2)
+        self.assertEqual(['A', 'B'], [e.name for e, df in result])
+        records = sorted(instrumentation.get_records(), key=lambda r: r.group)
+        self.assertEqual([('A', 3), ('B', 5)], [(r.group, r.rows_out) for r in records],
+                         'the measures of the process extraction were lost')
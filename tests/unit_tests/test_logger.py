@@ -0,0 +1,76 @@
+from unittest import TestCase
+from pathlib import Path
+from tempfile import TemporaryDirectory
+import io
+import json
+import logging
+
+import pandas as pd
+
+from pyfin.logger import configure_logging, shutdown_logging, write_log_entry, write_log_section, is_enabled
+from pyfin.coremodel import Extractor, extract_all
+
+
+class CountingRepr:
+    """ Counts how many times it is formatted"""
+    def __init__(self):
+        self.count = 0
+
+    def __str__(self):
+        self.count += 1
+        return 'counted'
+
+
+class LoggingExtractor(Extractor):
+    """ Logs its extraction, in a worker process when asked to"""
+    def __init__(self, name: str, executor: str):
+        super().__init__(name, 'Downloads', 'Archive')
+        self.executor = executor
+
+    def get_data(self, since=None) -> pd.DataFrame:
+        write_log_entry('/pyfin/extractors.py', 'extracting %s', self.name)
+        return pd.DataFrame({'Compte': [self.name]})
+
+
+class TestLogger(TestCase):
+    def setUp(self):
+        self.folder = TemporaryDirectory()
+        self.stream = io.StringIO()
+
+    def tearDown(self):
+        shutdown_logging()
+        logging.getLogger('pyfin').setLevel(logging.NOTSET)
+        self.folder.cleanup()
+
+    def test_text_and_json(self):
+        json_file = Path(self.folder.name).joinpath('pyfin.jsonl')
+        configure_logging('DEBUG', json_file, self.stream)
+        write_log_section('Extract')
+        write_log_entry('/pyfin/store.py', 'retrieved %d movements for %s', 3, 'CA')
+        write_log_entry('/pyfin/store.py', 'checking candidate', level=logging.DEBUG)
+        shutdown_logging()
+        self.assertEqual(['*** Extract ***', 'store | retrieved 3 movements for CA', 'store | checking candidate'],
+                         self.stream.getvalue().splitlines())
+        entries = [json.loads(line) for line in json_file.read_text(encoding='utf-8').splitlines()]
+        self.assertEqual(3, len(entries))
+        self.assertEqual({'level': 'INFO', 'context': 'store', 'message': 'retrieved 3 movements for CA'},
+                         {k: entries[1][k] for k in ['level', 'context', 'message']})
+
+    def test_lazy_formatting(self):
+        configure_logging('INFO', stream=self.stream)
+        counted = CountingRepr()
+        write_log_entry('/pyfin/store.py', 'checking candidate %s...', counted, level=logging.DEBUG)
+        write_log_entry('/pyfin/store.py', 'found %s', counted)
+        shutdown_logging()
+        self.assertFalse(is_enabled('/pyfin/store.py', logging.DEBUG))
+        self.assertEqual(1, counted.count, 'a suppressed entry was formatted')
+        self.assertEqual('store | found counted\n', self.stream.getvalue())
+
+    def test_worker_entries(self):
+        json_file = Path(self.folder.name).joinpath('pyfin.jsonl')
+        configure_logging('INFO', json_file, self.stream)
+        extract_all([LoggingExtractor('A', 'thread'), LoggingExtractor('B', 'process')], jobs=2)
+        shutdown_logging()
+        entries = [json.loads(line) for line in json_file.read_text(encoding='utf-8').splitlines()]
+        self.assertEqual(['extracting A', 'extracting B'], sorted(e['message'] for e in entries))
+        self.assertIn('extractors | extracting B', self.stream.getvalue().splitlines())
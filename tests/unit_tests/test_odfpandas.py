@@ -0,0 +1,362 @@
+from unittest import TestCase
+from pathlib import Path
+from tempfile import TemporaryDirectory
+import datetime as dt
+import struct
+import zipfile
+
+import pandas as pd
+from odf.opendocument import OpenDocumentSpreadsheet, load
+from odf.table import Table, TableRow, TableCell, TableRowGroup, NamedExpressions, NamedRange
+from odf.text import P, Span
+
+import pyfin.odfpandas as op
+from pyfin.odsstream import append_frame_to_ods, read_columns_from_ods
+
+
+def create_workbook(filepath: Path):
+    """ Creates a workbook with a header row, a filled row, and a styled empty template row"""
+    wb = OpenDocumentSpreadsheet()
+    table = Table(name='Comptes')
+    header = TableRow()
+    for title in ['Date', 'Description', 'Montant']:
+        header.addElement(op.generate_table_cell_text(title))
+    table.addElement(header)
+    filled = TableRow()
+    filled.addElement(op.generate_table_cell_datetime(dt.datetime(2024, 1, 2)))
+    filled.addElement(op.generate_table_cell_text('Loyer'))
+    filled.addElement(op.generate_table_cell_float(700.0))
+    table.addElement(filled)
+    template = TableRow()
+    template.addElement(TableCell(stylename='date', contentvalidationname='val1'))
+    template.addElement(TableCell(stylename='text'))
+    template.addElement(TableCell(stylename='amount'))
+    template.addElement(TableCell(stylename='extra', numbercolumnsrepeated='3'))
+    table.addElement(template)
+    wb.spreadsheet.addElement(table)
+    wb.write(filepath)
+
+
+def create_multisheet_workbook(filepath: Path):
+    """ Creates a workbook with a sheet before and after the comptes sheet, then repacks it as LibreOffice does :
+    the sizes in data descriptors after the entries, and extended timestamps in the extra fields"""
+    create_workbook(filepath)
+    wb = load(filepath)
+    comptes = wb.spreadsheet.getElementsByType(Table)[0]
+    for name in ['Budget', 'Notes']:
+        table = Table(name=name)
+        row = TableRow()
+        row.addElement(op.generate_table_cell_text(f'{name} 2024'))
+        row.addElement(op.generate_table_cell_float(1500.0))
+        table.addElement(row)
+        if name == 'Budget':
+            wb.spreadsheet.insertBefore(table, comptes)
+        else:
+            wb.spreadsheet.addElement(table)
+    wb.write(filepath)
+
+    with zipfile.ZipFile(filepath) as z:
+        entries = [(i, z.read(i)) for i in z.infolist()]
+
+    class Unseekable:
+        """ Output stream without seek, so that the sizes go to data descriptors"""
+        def __init__(self, f):
+            self.f = f
+
+        def write(self, data):
+            return self.f.write(data)
+
+        def flush(self):
+            self.f.flush()
+
+    with open(filepath, 'wb') as f, zipfile.ZipFile(Unseekable(f), 'w') as z:
+        for info, data in entries:
+            target = zipfile.ZipInfo(info.filename, date_time=info.date_time)
+            target.compress_type = info.compress_type
+            target.extra = struct.pack('<HHBl', 0x5455, 5, 1, 1700000000)
+            z.writestr(target, data)
+
+
+def get_cell_texts(row) -> list:
+    return [str(c.getElementsByType(P)[0]) if c.hasChildNodes() else '' for c in row.getElementsByType(TableCell)]
+
+
+class TestInsertFromDataframe(TestCase):
+    def setUp(self):
+        self.folder = TemporaryDirectory()
+        self.filepath = Path(self.folder.name).joinpath('comptes.ods')
+        create_workbook(self.filepath)
+        self.df = pd.DataFrame(data={'Date': pd.to_datetime(['2024-02-01', '2024-02-03']),
+                                     'Description': ['Leclerc', 'Essence'],
+                                     'Montant': [42.5, 60.0]})
+
+    def tearDown(self):
+        self.folder.cleanup()
+
+    def test_append(self):
+        wb = op.SpreadsheetWrapper()
+        wb.load(self.filepath)
+        wb.get_sheets()['Comptes'].insert_from_dataframe(self.df, mode='append')
+        wb.save(self.filepath)
+
+        wb = op.SpreadsheetWrapper()
+        wb.load(self.filepath)
+        ws = wb.get_sheets()['Comptes']
+        self.assertEqual(ws.get_row_count(), 5)
+        self.assertEqual(get_cell_texts(ws.get_row(2))[:3], ['01/02/2024', 'Leclerc', '42.5'])
+        self.assertEqual(get_cell_texts(ws.get_row(3))[:3], ['03/02/2024', 'Essence', '60.0'])
+        # the template row is kept at the end
+        self.assertTrue(ws.is_row_empty(ws.get_row(4)))
+        # the styles and validation rules of the template are applied
+        row = ws.get_row(3)
+        self.assertEqual(ws.get_row_style_array(row), ['date', 'text', 'amount', 'extra', 'extra', 'extra'])
+        self.assertEqual(ws.get_row_validation_array(row), ['val1', '', '', '', '', ''])
+        # the trailing empty cells are grouped
+        self.assertEqual(len(row.getElementsByType(TableCell)), 4)
+
+    def test_overwrite(self):
+        wb = op.SpreadsheetWrapper()
+        wb.load(self.filepath)
+        ws = wb.get_sheets()['Comptes']
+        ws.insert_from_dataframe(self.df, include_headers=True, mode='overwrite')
+        self.assertEqual(ws.get_row_count(), 3)
+        self.assertEqual(get_cell_texts(ws.get_row(0)), ['Date', 'Description', 'Montant'])
+        self.assertEqual(get_cell_texts(ws.get_row(1)), ['01/02/2024', 'Leclerc', '42.5'])
+
+    def test_row_index(self):
+        wb = op.SpreadsheetWrapper()
+        wb.load(self.filepath)
+        ws = wb.get_sheets()['Comptes']
+        self.assertEqual(ws.get_first_empty_row(), 2)
+        self.assertEqual(ws.get_cell(2, 5).getAttribute('stylename'), 'extra')
+        with self.assertRaises(IndexError):
+            ws.get_cell(2, 6)
+        ws.insert_from_dataframe(self.df, mode='append')
+        # the index follows the insertions
+        self.assertEqual(ws.get_row_count(), 5)
+        self.assertEqual(ws.get_first_empty_row(), 4)
+        self.assertEqual(str(ws.get_cell(3, 1)), 'Essence')
+        ws.invalidate()
+        self.assertEqual(ws.get_row_count(), 5)
+        self.assertEqual(ws.get_first_empty_row(), 4)
+
+    def test_sheets_per_workbook(self):
+        wb = op.SpreadsheetWrapper()
+        wb.load(self.filepath)
+        self.assertEqual(list(wb.get_sheets()), ['Comptes'])
+        self.assertEqual(op.SpreadsheetWrapper().get_sheets(), {})
+
+
+class TestToDataframe(TestCase):
+    def setUp(self):
+        self.folder = TemporaryDirectory()
+        self.filepath = Path(self.folder.name).joinpath('comptes.ods')
+        create_workbook(self.filepath)
+        wb = op.SpreadsheetWrapper()
+        wb.load(self.filepath)
+        self.ws = wb.get_sheets()['Comptes']
+        # a repeated row, followed by a trailing run of empty rows
+        row = TableRow(numberrowsrepeated='2')
+        row.addElement(op.generate_table_cell_datetime(dt.datetime(2024, 1, 5)))
+        row.addElement(op.generate_table_cell_text('Virement'))
+        row.addElement(TableCell(numbercolumnsrepeated='2'))
+        row.addElement(op.generate_table_cell_float(12.5))
+        self.ws.get_row(1).parentNode.insertBefore(row, self.ws.get_row(2))
+        self.ws.get_row(1).parentNode.addElement(TableRow(numberrowsrepeated='1000'))
+        self.ws.invalidate()
+
+    def tearDown(self):
+        self.folder.cleanup()
+
+    def test_read(self):
+        df = self.ws.to_dataframe()
+        self.assertEqual(list(df.columns), ['Date', 'Description', 'Montant', 'Unnamed: 3', 'Unnamed: 4'])
+        self.assertEqual(len(df), 3)
+        self.assertEqual(df['Date'].dtype, 'datetime64[ns]')
+        self.assertEqual(df['Montant'].tolist()[0], 700.0)
+        self.assertEqual(df['Description'].tolist(), ['Loyer', 'Virement', 'Virement'])
+        self.assertEqual(df['Unnamed: 4'].tolist()[1:], [12.5, 12.5])
+
+    def test_read_selection(self):
+        df = self.ws.to_dataframe(usecols=['Date', 4], nrows=2)
+        self.assertEqual(list(df.columns), ['Date', 'Unnamed: 4'])
+        self.assertEqual(df['Date'].tolist(), [pd.Timestamp(2024, 1, 2), pd.Timestamp(2024, 1, 5)])
+        df = self.ws.to_dataframe(columns=['Montant'], usecols=[2], header=False)
+        self.assertEqual(df['Montant'].tolist(), ['Montant', 700.0])
+        with self.assertRaises(KeyError):
+            self.ws.to_dataframe(usecols=['Inconnue'])
+
+
+class TestAppendFrameToOds(TestCase):
+    def setUp(self):
+        self.folder = TemporaryDirectory()
+        self.filepath = Path(self.folder.name).joinpath('comptes.ods')
+        create_workbook(self.filepath)
+        self.df = pd.DataFrame(data={'Date': pd.to_datetime(['2024-02-01', '2024-02-03']),
+                                     'Description': ['Leclerc & Co', 'Essence'],
+                                     'Montant': [42.5, 60.0]})
+
+    def tearDown(self):
+        self.folder.cleanup()
+
+    def test_append_like_dom(self):
+        dom_filepath = Path(self.folder.name).joinpath('dom.ods')
+        create_workbook(dom_filepath)
+        wb = op.SpreadsheetWrapper()
+        wb.load(dom_filepath)
+        wb.get_sheets()['Comptes'].insert_from_dataframe(self.df, mode='append')
+        wb.save(dom_filepath)
+
+        append_frame_to_ods(self.df, self.filepath, 'Comptes')
+
+        expected = op.SpreadsheetWrapper()
+        expected.load(dom_filepath)
+        expected = expected.get_sheets()['Comptes']
+        result = op.SpreadsheetWrapper()
+        result.load(self.filepath)
+        result = result.get_sheets()['Comptes']
+        self.assertEqual(result.get_row_count(), expected.get_row_count())
+        for i in range(expected.get_row_count()):
+            self.assertEqual(get_cell_texts(result.get_row(i)), get_cell_texts(expected.get_row(i)))
+            self.assertEqual(result.get_row_style_array(result.get_row(i)),
+                             expected.get_row_style_array(expected.get_row(i)))
+            self.assertEqual(result.get_row_validation_array(result.get_row(i)),
+                             expected.get_row_validation_array(expected.get_row(i)))
+
+    def test_mixed_types_like_dom(self):
+        df = pd.DataFrame(data={'Date': pd.to_datetime(['2024-02-01', '2024-02-03', '2024-02-04']),
+                                'Description': ['Leclerc', '', None],
+                                'Montant': [42.5, 0.0, 60.0],
+                                'No': [0, 1, 2],
+                                'Référence': [0, '1234567', ''],
+                                'excluded': [False, True, False]})
+        dom_filepath = Path(self.folder.name).joinpath('dom.ods')
+        create_workbook(dom_filepath)
+        wb = op.SpreadsheetWrapper()
+        wb.load(dom_filepath)
+        wb.get_sheets()['Comptes'].insert_from_dataframe(df, mode='append')
+        wb.save(dom_filepath)
+
+        append_frame_to_ods(df, self.filepath, 'Comptes')
+
+        frames = []
+        for filepath in [dom_filepath, self.filepath]:
+            wb = op.SpreadsheetWrapper()
+            wb.load(filepath)
+            frames.append(wb.get_sheets()['Comptes'].to_dataframe(header=False))
+        pd.testing.assert_frame_equal(frames[1], frames[0])
+        # the falsy values are written as empty cells, the other ones as text
+        self.assertEqual(['', 'True', ''], frames[1].iloc[2:, 5].fillna('').tolist())
+
+    def test_append_without_empty_row(self):
+        wb = OpenDocumentSpreadsheet()
+        table = Table(name='Comptes')
+        header = TableRow()
+        header.addElement(op.generate_table_cell_text('Date'))
+        table.addElement(header)
+        group = TableRowGroup()
+        filled = TableRow()
+        filled.addElement(op.generate_table_cell_datetime(dt.datetime(2024, 1, 2)))
+        group.addElement(filled)
+        table.addElement(group)
+        # the elements closing the sheet, after its rows
+        expressions = NamedExpressions()
+        expressions.addElement(NamedRange(name='Dates', cellrangeaddress='$Comptes.$A$1:.$A$2'))
+        table.addElement(expressions)
+        wb.spreadsheet.addElement(table)
+        wb.write(self.filepath)
+
+        append_frame_to_ods(self.df, self.filepath, 'Comptes')
+
+        table = load(self.filepath).spreadsheet.getElementsByType(Table)[0]
+        self.assertEqual(['table:table-row', 'table:table-row-group', 'table:named-expressions'],
+                         [n.tagName for n in table.childNodes])
+        rows = table.getElementsByType(TableRow)
+        self.assertEqual(4, len(rows))
+        self.assertEqual(['01/02/2024', 'Leclerc & Co', '42.5'], get_cell_texts(rows[2]))
+        self.assertEqual(3, len(table.childNodes[1].childNodes), 'the rows were not added to the row group')
+
+    def test_other_parts_untouched(self):
+        with zipfile.ZipFile(self.filepath) as z:
+            before = {i.filename: z.read(i) for i in z.infolist() if i.filename != 'content.xml'}
+        append_frame_to_ods(self.df, self.filepath, 'Comptes')
+        with zipfile.ZipFile(self.filepath) as z:
+            self.assertIsNone(z.testzip())
+            self.assertEqual(z.namelist()[0], 'mimetype')
+            after = {i.filename: z.read(i) for i in z.infolist() if i.filename != 'content.xml'}
+        self.assertEqual(after, before)
+
+    def test_unknown_sheet(self):
+        with self.assertRaises(KeyError):
+            append_frame_to_ods(self.df, self.filepath, 'Inconnue')
+
+    def test_multisheet_repacked(self):
+        create_multisheet_workbook(self.filepath)
+        with zipfile.ZipFile(self.filepath) as z:
+            self.assertTrue(all(i.flag_bits & 0x08 for i in z.infolist()), 'the workbook has no data descriptors')
+            before = {i.filename: z.read(i) for i in z.infolist() if i.filename != 'content.xml'}
+
+        append_frame_to_ods(self.df, self.filepath, 'Comptes')
+
+        with zipfile.ZipFile(self.filepath) as z:
+            self.assertIsNone(z.testzip())
+            self.assertEqual(z.namelist()[0], 'mimetype')
+            self.assertEqual(z.getinfo('mimetype').compress_type, zipfile.ZIP_STORED)
+            after = {i.filename: z.read(i) for i in z.infolist() if i.filename != 'content.xml'}
+        self.assertEqual(after, before)
+        wb = op.SpreadsheetWrapper()
+        wb.load(self.filepath)
+        sheets = wb.get_sheets()
+        self.assertEqual(['Budget', 'Comptes', 'Notes'], list(sheets))
+        self.assertEqual(get_cell_texts(sheets['Comptes'].get_row(3))[:3], ['03/02/2024', 'Essence', '60.0'])
+        for name in ['Budget', 'Notes']:
+            self.assertEqual(sheets[name].get_row_count(), 1)
+            self.assertEqual(get_cell_texts(sheets[name].get_row(0)), [f'{name} 2024', '1500.0'])
+
+
+class TestReadColumnsFromOds(TestCase):
+    def setUp(self):
+        self.folder = TemporaryDirectory()
+        self.filepath = Path(self.folder.name).joinpath('comptes.ods')
+
+    def tearDown(self):
+        self.folder.cleanup()
+
+    def test_read_like_dom(self):
+        wb = OpenDocumentSpreadsheet()
+        wb.spreadsheet.addElement(Table(name='Budget'))
+        table = Table(name='Comptes')
+        header = TableRow()
+        for title in ['N°', 'Description', 'Description', 'Date']:
+            header.addElement(op.generate_table_cell_text(title))
+        table.addElement(header)
+        # repeated cells and rows, an empty row between the values, a covered cell, formatted text
+        row = TableRow(numberrowsrepeated='2')
+        row.addElement(op.generate_table_cell_float(1.0))
+        row.addElement(TableCell(numbercolumnsrepeated='2'))
+        row.addElement(op.generate_table_cell_datetime(dt.datetime(2024, 1, 2)))
+        table.addElement(row)
+        table.addElement(TableRow(numberrowsrepeated='3'))
+        row = TableRow()
+        row.addElement(op.generate_table_cell_integer(2))
+        cell = TableCell(valuetype='string')
+        paragraph = P(text='Leclerc ')
+        paragraph.addElement(Span(text='Drive'))
+        cell.addElement(paragraph)
+        cell.addElement(P(text='Courses'))
+        row.addElement(cell)
+        row.addElement(TableCell(valuetype='boolean', booleanvalue='true'))
+        row.addElement(op.generate_table_cell_datetime(dt.datetime(2024, 2, 1, 10, 30)))
+        table.addElement(row)
+        table.addElement(TableRow(numberrowsrepeated='1000'))
+        wb.spreadsheet.addElement(table)
+        wb.write(self.filepath)
+
+        expected = op.SpreadsheetWrapper()
+        expected.load(self.filepath)
+        expected = expected.get_sheets()['Comptes'].to_dataframe(usecols=['Date', 'N°', 'Description'])
+        result = read_columns_from_ods(self.filepath, 'Comptes', ['Date', 'N°', 'Description', 'Inconnue'])
+        pd.testing.assert_frame_equal(expected, result)
+        self.assertEqual(['Leclerc Drive\nCourses'], result['Description'].dropna().tolist())
+        with self.assertRaises(KeyError):
+            read_columns_from_ods(self.filepath, 'Inconnue', ['N°'])
@@ -0,0 +1,46 @@
+from unittest import TestCase
+from random import Random
+
+from pyfin.database import Mouvement, ReconciliationIndex, is_equal_amount_compte
+
+
+class TestReconciliationIndex(TestCase):
+    def setUp(self):
+        rnd = Random(42)
+        comptes = ['Crédit Agricole', 'Boursorama', None]
+        amounts = [None, 10.0, 12.5, 12.499, 99.99, 100.0]
+        self.futurs = [Mouvement(index=i,
+                                 compte=rnd.choice(comptes),
+                                 depense=rnd.choice(amounts),
+                                 recette=rnd.choice(amounts),
+                                 depense_initiale=rnd.choice(amounts),
+                                 no_de_reference=rnd.choice([None, '1234567', '7654321']))
+                       for i in range(200)]
+        self.candidates = [Mouvement(compte=rnd.choice(comptes),
+                                     depense=rnd.choice(amounts),
+                                     recette=rnd.choice(amounts),
+                                     no_de_reference=rnd.choice([None, None, '1234567', '7654321', '0000000']))
+                           for _ in range(150)]
+
+    def test_same_pairings_as_scan(self):
+        # reference : the scan of the list, as done historically
+        scanned = list(self.futurs)
+        expected = []
+        for candidate in self.candidates:
+            if candidate.is_cheque():
+                matches = [c for c in scanned if c.no_de_reference == candidate.no_de_reference]
+            else:
+                matches = [s for s in scanned if is_equal_amount_compte(s, candidate)]
+            expected.append(matches[0].index if len(matches) > 0 else None)
+            if len(matches) > 0:
+                scanned.remove(matches[0])
+
+        pending = ReconciliationIndex(self.futurs)
+        result = []
+        for candidate in self.candidates:
+            m = pending.pop_cheque(candidate) if candidate.is_cheque() else pending.pop_similar(candidate)
+            result.append(None if m is None else m.index)
+
+        self.assertEqual(expected, result, 'the index does not give the same pairings as the scan')
+        self.assertEqual([m.index for m in scanned], [m.index for m in pending.remaining()])
+        self.assertEqual(len(scanned), len(pending))
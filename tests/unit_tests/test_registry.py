@@ -0,0 +1,80 @@
+from unittest import TestCase
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+from pyfin.registry import ExtractorRegistry, ExtractorSettings, ExtractorPlugin, CreditAgricolePlugin, \
+    BoursoramaPlugin, LiquidePlugin, get_extractors
+
+
+class CountingPlugin(BoursoramaPlugin):
+    """ Plugin recording the creations of its extractors"""
+
+    def __init__(self):
+        self.created = 0
+
+    def create(self, settings: ExtractorSettings) -> list:
+        self.created += 1
+        return ['extractor']
+
+
+class IncompletePlugin(ExtractorPlugin):
+    """ Plugin forgetting to create its extractors"""
+    name = 'Incomplete'
+
+
+class TestExtractorRegistry(TestCase):
+    def setUp(self):
+        self.folder = TemporaryDirectory()
+        self.settings = ExtractorSettings(self.folder.name, 'Archive')
+
+    def tearDown(self):
+        self.folder.cleanup()
+
+    def test_builtin_plugins(self):
+        names = [p.name for p in ExtractorRegistry().get_plugins()]
+        self.assertEqual(['Crédit Agricole', 'Boursorama', 'Liquide'], names)
+
+    def test_has_new_data(self):
+        self.assertFalse(CreditAgricolePlugin().has_new_data(self.settings))
+        Path(self.folder.name).joinpath('CA20240330_120000.xlsx').touch()
+        self.assertTrue(CreditAgricolePlugin().has_new_data(self.settings))
+        self.assertFalse(BoursoramaPlugin().has_new_data(self.settings))
+        with self.assertLogs('pyfin.registry', 'WARNING') as logs:
+            self.assertFalse(LiquidePlugin().has_new_data(self.settings))
+        self.assertIn('Liquide Vincent', logs.output[0])
+        self.assertTrue(LiquidePlugin().has_new_data(ExtractorSettings(self.folder.name, 'Archive', 'key.json')))
+
+    def test_only_pending(self):
+        Path(self.folder.name).joinpath('CA20240330_120000.xlsx').touch()
+        extractors = ExtractorRegistry().get_extractors(self.settings)
+        self.assertEqual(['Crédit Agricole'], [e.name for e in extractors])
+        extractors = ExtractorRegistry().get_extractors(self.settings, only_pending=False)
+        self.assertEqual(['Crédit Agricole', 'Boursorama', 'Liquide Vincent', 'Liquide Aurélie'],
+                         [e.name for e in extractors])
+
+    def test_stop_at_watermark(self):
+        Path(self.folder.name).joinpath('CA20240330_120000.xlsx').touch()
+        for stop in [False, True]:
+            settings = ExtractorSettings(self.folder.name, 'Archive', stop_at_watermark=stop)
+            extractor = ExtractorRegistry().get_extractors(settings)[0]
+            self.assertEqual(stop, extractor.__stop_at_watermark__)
+
+    def test_register(self):
+        plugin = CountingPlugin()
+        registry = ExtractorRegistry([CreditAgricolePlugin, BoursoramaPlugin])
+        registry.register(plugin)
+        # the plugin replaces the one of the same name, and is only created when its source has data
+        self.assertIs(plugin, registry.get_plugins()[1])
+        self.assertEqual([], registry.get_extractors(self.settings))
+        self.assertEqual(0, plugin.created)
+        Path(self.folder.name).joinpath('export-operations-30-03-2024.csv').touch()
+        self.assertEqual(['extractor'], registry.get_extractors(self.settings))
+        self.assertEqual(1, plugin.created)
+
+    def test_register_incomplete(self):
+        # a plugin without create fails when registered, not during the import
+        with self.assertRaises(TypeError):
+            ExtractorRegistry([CreditAgricolePlugin]).register(IncompletePlugin)
+
+    def test_test_mode(self):
+        self.assertEqual(['Compte De Test'], [e.name for e in get_extractors(self.settings, test_mode=True)])
@@ -0,0 +1,74 @@
+from unittest import TestCase
+import datetime as dt
+
+from pyfin.extractors import ExtractorLiquide
+from pyfin.sheetssession import SheetsSession
+
+
+class StubWorksheet:
+    def __init__(self, title: str):
+        self.title = title
+
+
+class StubWorkbook:
+    id = 'workbook-id'
+
+    def __init__(self, titles: list):
+        self.__worksheets__ = [StubWorksheet(t) for t in titles]
+
+    def __iter__(self):
+        return iter(self.__worksheets__)
+
+
+class StubSheetApi:
+    def __init__(self, values: dict):
+        self.values = values
+        self.batches = []
+
+    def values_batch_get(self, spreadsheet_id: str, value_ranges: list) -> list:
+        self.batches.append(value_ranges)
+        return [{'range': r, 'values': self.values[r.strip("'")]} for r in value_ranges]
+
+
+class StubClient:
+    """ Stands for an authorised pygsheets client, and counts the calls"""
+    def __init__(self, values: dict):
+        self.sheet = StubSheetApi(values)
+        self.authorizations = 0
+        self.opened = []
+
+    def authorize(self, authentication_key: str):
+        self.authorizations += 1
+        return self
+
+    def open(self, title: str) -> StubWorkbook:
+        self.opened.append(title)
+        return StubWorkbook(list(self.sheet.values))
+
+
+class TestSheetsSession(TestCase):
+    def setUp(self):
+        self.client = StubClient({'Liquide Vincent': [['Date', 'Description', 'Dépense', 'Recette'],
+                                                      ['01/03/2024', 'Boulangerie', '4,50 €', ''],
+                                                      ['10/03/2024', 'Marché', '12 €']],
+                                  'Liquide Aurélie': [['Date', 'Description', 'Dépense', 'Recette'],
+                                                      ['02/03/2024', 'Fleurs', '', '20 €']],
+                                  'Autre': [['Date']]})
+        self.session = SheetsSession('key.json', client_factory=self.client.authorize)
+
+    def test_shared_session(self):
+        extractors = [ExtractorLiquide(name, '', '', 'key.json', self.session)
+                      for name in ['Liquide Vincent', 'Liquide Aurélie']]
+        vincent = extractors[0].get_data(since=dt.date(2024, 3, 5))
+        aurelie = extractors[1].get_data()
+        # authorised once, opened once, and a single batch for both worksheets
+        self.assertEqual(1, self.client.authorizations)
+        self.assertEqual(['Dépenses Liquides'], self.client.opened)
+        self.assertEqual([["'Liquide Vincent'", "'Liquide Aurélie'"]], self.client.sheet.batches)
+        self.assertEqual(['Marché'], vincent['Description'].tolist())
+        self.assertEqual([12.0], vincent['Dépense'].tolist())
+        self.assertEqual([20.0], aurelie['Recette'].tolist())
+
+    def test_unknown_sheet(self):
+        with self.assertRaises(KeyError):
+            self.session.get_frame('Liquide Inconnu')
@@ -0,0 +1,103 @@
+from unittest import TestCase
+from pathlib import Path
+from tempfile import TemporaryDirectory
+import contextlib
+import io
+import subprocess
+import sys
+import datetime as dt
+from unittest.mock import patch
+
+import pandas as pd
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from pyfin.__main__ import main
+from pyfin.database import Base, MapCategorie, engine_registry
+
+root = Path(__file__).parents[2]
+heavy_modules = ['pandas', 'numpy', 'sqlalchemy', 'openpyxl', 'pygsheets', 'odf']
+
+
+def get_imported_modules(*args) -> set:
+    """ Runs the command line in a new interpreter, and returns the modules imported, as reported by -X importtime.
+    The arguments are the ones of the pyfin command, or the python ones when starting with -c"""
+    command = list(args) if len(args) > 0 and args[0] == '-c' else ['-m', 'pyfin', *args]
+    process = subprocess.run([sys.executable, '-X', 'importtime', *command], cwd=root,
+                             capture_output=True, text=True)
+    lines = [line.split('|') for line in process.stderr.splitlines() if line.startswith('import time:')]
+    return {line[-1].strip() for line in lines[1:]}
+
+
+class TestStartup(TestCase):
+    def test_help_imports(self):
+        modules = get_imported_modules('--help')
+        self.assertIn('pyfin.configmanager', modules)
+        for m in heavy_modules:
+            self.assertNotIn(m, modules, f'{m} is imported to print the help')
+
+    def test_index_finder_imports(self):
+        # the index is looked up in the database without pandas
+        modules = get_imported_modules('-c', 'import pyfin.indexfinder')
+        self.assertIn('pyfin.indexfinder', modules)
+        self.assertNotIn('pandas', modules)
+
+    def test_list_mappings(self):
+        with TemporaryDirectory() as folder:
+            url = 'sqlite:///' + str(Path(folder).joinpath('finance.sqlite'))
+            config_file = Path(folder).joinpath('pyfin.conf')
+            config_file.write_text(f'[DATABASE]\nurl = {url}\n')
+            e = create_engine(url)
+            Base.metadata.create_all(e)
+            with Session(e) as session:
+                session.add(MapCategorie(keyword='Leclerc', categorie='Courses', inactif=False))
+                session.commit()
+            e.dispose()
+
+            output = io.StringIO()
+            with contextlib.redirect_stdout(output):
+                main(['--list-mappings'], config_file)
+            engine_registry.dispose()
+            self.assertIn('Leclerc -> Courses', output.getvalue())
+
+    def test_invalid_jobs(self):
+        for args in [['--sql2', '--jobs', 'abc'], ['--sql2', '--jobs', '0'], ['--sql2', '--jobs']]:
+            output = io.StringIO()
+            with contextlib.redirect_stdout(output):
+                main(args)
+            self.assertIn('--jobs expects a positive number', output.getvalue())
+
+    def test_default_import_keeps_rows(self):
+        with TemporaryDirectory() as folder:
+            home = Path(folder)
+            home.joinpath('Bureau').mkdir()
+            home.joinpath('Downloads').mkdir()
+            home.joinpath('Extracts').mkdir()
+            # the previous export gives the first index and the start date
+            home.joinpath('Extracts', 'comptes.csv').write_text(f"N°,Date d'insertion\n41,{dt.date.today() - dt.timedelta(days=7)}\n")
+            url = 'sqlite:///' + str(home.joinpath('finance.sqlite'))
+            e = create_engine(url)
+            Base.metadata.create_all(e)
+            with Session(e) as session:
+                session.add_all([MapCategorie(keyword=k, categorie='Courses', inactif=False)
+                                 for k in ['Leclerc', 'Auchan', 'Carrefour']])
+                session.commit()
+            e.dispose()
+            config_file = home.joinpath('pyfin.conf')
+
+            def run_import(other: str) -> pd.DataFrame:
+                config_file.write_text(f'[DATABASE]\nurl = {url}\n[SOURCE]\nDownloadFolder = {home / "Downloads"}\n'
+                                       f'[EXTRACTS]\nExtractFolder = {home / "Extracts"}\n[CACHE]\nEnabled = False\n'
+                                       f'[OTHER]\n{other}')
+                with patch.dict('os.environ', {'HOME': folder}):
+                    main(['--ods', '--test-mode', '--csv-only', '--no-archive'], config_file)
+                engine_registry.dispose()
+                return pd.read_csv(home.joinpath('Bureau', 'ca_extract.csv'))
+
+            # the threshold written by the previous versions does not spread anything by default
+            df = run_import('periodization_threshold = 150\n')
+            self.assertEqual(1, (df['Description'] == 'Test|Dépense À Splitter').sum(), df['Description'].tolist())
+            self.assertTrue(df['Index'].is_unique)
+            # once enabled, the expense is spread over its year
+            df = run_import('periodization_threshold = 150\nperiodization = True\n')
+            self.assertEqual(12, (df['Description'] == 'Test|Dépense À Splitter').sum())
@@ -0,0 +1,60 @@
+from unittest import TestCase
+from pathlib import Path
+from tempfile import TemporaryDirectory
+import datetime as dt
+import os
+from unittest.mock import patch
+
+import pandas as pd
+
+from pyfin.statementcache import StatementCache
+
+
+class TestStatementCache(TestCase):
+    def setUp(self):
+        self.folder = TemporaryDirectory()
+        self.cache = StatementCache(Path(self.folder.name).joinpath('cache'), max_age_days=30, max_size_mb=1)
+        self.statement = Path(self.folder.name).joinpath('export-operations.csv')
+        self.statement.write_text('dateOp;label;amount\n2024-03-01;Leclerc;-42,5\n')
+        self.df = pd.DataFrame(data={'Description': ['Leclerc'], 'Dépense': [42.5]})
+
+    def tearDown(self):
+        self.folder.cleanup()
+
+    def test_get_put(self):
+        self.assertIsNone(self.cache.get(self.statement, 'Boursorama', 1))
+        self.cache.put(self.statement, 'Boursorama', 1, self.df)
+        pd.testing.assert_frame_equal(self.df, self.cache.get(self.statement, 'Boursorama', 1))
+        # the entry depends on the extractor, its version, and the content of the file
+        self.assertIsNone(self.cache.get(self.statement, 'Boursorama', 2))
+        self.assertIsNone(self.cache.get(self.statement, 'Crédit Agricole', 1))
+        renamed = self.statement.rename(self.statement.with_name('export-operations-copy.csv'))
+        self.assertIsNotNone(self.cache.get(renamed, 'Boursorama', 1))
+        renamed.write_text('dateOp;label;amount\n')
+        self.assertIsNone(self.cache.get(renamed, 'Boursorama', 1))
+
+    def test_get_or_parse(self):
+        parsed = []
+        for i in range(2):
+            with patch.object(StatementCache, 'hash_file', side_effect=StatementCache.hash_file) as hash_file:
+                df = self.cache.get_or_parse(self.statement, 'Boursorama', 1, lambda f: parsed.append(f) or self.df)
+            pd.testing.assert_frame_equal(self.df, df)
+            self.assertEqual(1, hash_file.call_count, 'the file was hashed more than once')
+        self.assertEqual([self.statement], parsed, 'the file was parsed again')
+
+    def test_evict(self):
+        for version in range(3):
+            self.cache.put(self.statement, 'Boursorama', version, self.df)
+        old = self.cache.get_entry(self.statement, 'Boursorama', 0)
+        os.utime(old, (0, dt.datetime(2020, 1, 1).timestamp()))
+        self.assertEqual(1, self.cache.evict())
+        self.assertFalse(old.exists())
+        self.assertIsNotNone(self.cache.get(self.statement, 'Boursorama', 1))
+
+        # the least recently used entries are removed first when the cache is too large
+        size = self.cache.get_entry(self.statement, 'Boursorama', 1).stat().st_size
+        small = StatementCache(self.cache.folder, max_age_days=30, max_size_mb=1.5 * size / 1024 / 1024)
+        os.utime(small.get_entry(self.statement, 'Boursorama', 2), (0, dt.datetime.now().timestamp() - 60))
+        self.assertEqual(1, small.evict())
+        self.assertIsNotNone(small.get(self.statement, 'Boursorama', 1))
+        self.assertIsNone(small.get(self.statement, 'Boursorama', 2))
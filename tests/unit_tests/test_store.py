@@ -0,0 +1,75 @@
+from unittest import TestCase
+from pathlib import Path
+from tempfile import TemporaryDirectory
+import datetime as dt
+
+import pandas as pd
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import Session
+
+from pyfin.database import Base, Job, Mouvement
+from pyfin.store import store_frame_to_sql_mode_7
+
+
+class TestStoreModeSept(TestCase):
+    def setUp(self):
+        self.folder = TemporaryDirectory()
+        self.engine = create_engine('sqlite:///' + str(Path(self.folder.name).joinpath('finance.sqlite')))
+        Base.metadata.create_all(self.engine)
+        self.today = dt.date(2024, 3, 15)
+        with Session(self.engine) as session:
+            job = Job(job_key='provisions', job_timestamp=dt.datetime(2024, 1, 1))
+            session.add_all([Mouvement(date=self.today, no=10, description='Chèque plombier', depense=80, compte='CA',
+                                       categorie='Maison', mois=self.today, date_insertion=self.today,
+                                       no_de_reference='1234567', date_out_of_bound=False, job=job),
+                             Mouvement(date=self.today, no=11, description='Loyer', depense=700, compte='CA',
+                                       categorie='Maison', mois=self.today, date_insertion=self.today,
+                                       date_out_of_bound=False, job=job),
+                             Mouvement(date=self.today, no=12, description='Impôts', depense=150, compte='CA',
+                                       categorie='Impôts', mois=self.today, date_insertion=self.today,
+                                       date_out_of_bound=False, job=job)])
+            session.commit()
+
+    def get_frame(self) -> pd.DataFrame:
+        return pd.DataFrame(data={'Index': [1, 2, 3],
+                                  'Date': [self.today] * 3,
+                                  'Description': ['Cheque Emis 1234567', 'Prlv Loyer', 'Leclerc'],
+                                  'Recette': [None, None, None],
+                                  'Dépense': [80.0, 700.0, 42.5],
+                                  'Compte': ['CA'] * 3,
+                                  'Catégorie': ['', '', 'Courses'],
+                                  'Mois': [self.today] * 3,
+                                  'InsertDate': [self.today] * 3,
+                                  'Numéro de référence': ['1234567', '', ''],
+                                  'Organisme': ['nan'] * 3,
+                                  'Déclarant': ['nan'] * 3,
+                                  'Employeur': ['nan'] * 3})
+
+    def get_state(self) -> list:
+        with Session(self.engine) as session:
+            return [(m.no, m.date, m.description, m.label_utilisateur, m.date_out_of_bound, m.job.job_key,
+                     m.economie)
+                    for m in session.scalars(select(Mouvement).order_by(Mouvement.index))]
+
+    def store(self, bulk: bool, simulate: bool = False):
+        store_frame_to_sql_mode_7(self.get_frame(), self.engine, self.today, self.today, 100,
+                                  simulate=simulate, account_name='CA', bulk=bulk)
+
+    def test_bulk_same_as_orm(self):
+        self.store(bulk=False)
+        expected = self.get_state()
+        self.tearDown()
+        self.setUp()
+        self.store(bulk=True)
+        self.assertEqual(expected, self.get_state(), 'the bulk mode does not store the same rows')
+        self.assertEqual(6, len(expected))
+        self.assertEqual([True, True, False], [r[4] for r in expected[3:]])
+
+    def test_bulk_simulate(self):
+        before = self.get_state()
+        self.store(bulk=True, simulate=True)
+        self.assertEqual(before, self.get_state(), 'the simulation changed the database')
+
+    def tearDown(self):
+        self.engine.dispose()
+        self.folder.cleanup()